@@ -0,0 +1,141 @@
+# See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+"""
+Latency and throughput of the main endpoints, run in process against the offline stand-ins of Elasticsearch and
+the hive (see offline.py), so that it needs no service and can be run before each deployment.
+
+Each endpoint is timed cold (all the caches of the app cleared before each request) and warm, then requested
+by concurrent clients (threads) for its throughput.
+
+    python benchmarks/bench_app.py --jobs 1000 --species 10 --datachecks 100 --tests 5
+"""
+import argparse
+import statistics
+import threading
+import time
+
+from offline import OfflineApp
+
+
+def percentile(timings, p):
+    timings = sorted(timings)
+    return timings[min(len(timings) - 1, int(p * len(timings)))]
+
+
+def cases(offline):
+    """(name, method, path, json body, results source) of the requests benchmarked"""
+    job_ids = sorted(offline.jsonfiles)
+    job_id = job_ids[len(job_ids) // 2]
+    zip_job_id = job_ids[0]
+    offline.write_outputs(zip_job_id)
+    name = offline.app.catalog.snapshot.index.names_list[0]
+    return [
+        ('/names/list', 'GET', '/names/list', None, None),
+        ('/groups/list', 'GET', '/groups/list', None, None),
+        ('/servers/list', 'GET', '/servers/list', None, None),
+        ('/names/<name>', 'GET', f'/names/{name}', None, None),
+        ('/search/<keyword>', 'GET', f'/search/{name[:5]}', None, None),
+        ('/jobs page', 'GET', '/jobs?limit=25&offset=0', None, None),
+        ('/jobs search', 'GET', '/jobs?limit=25&search=handover', None, None),
+        ('/jobs status', 'GET', '/jobs?limit=25&status=failed', None, None),
+        ('/jobs/<id>', 'GET', f'/jobs/{job_id}?format=json', None, None),
+        ('/jobs/details', 'GET', f'/jobs/details?jsonfile={offline.jsonfiles[job_id]}', None, None),
+        ('/jobs/details/batch', 'POST', '/jobs/details/batch',
+         {'jsonfiles': [offline.jsonfiles[i] for i in job_ids[:10]]}, None),
+        ('download (ES)', 'GET', f'/download_datacheck_outputs/{job_id}', None, None),
+        ('download (zip)', 'GET', f'/download_datacheck_outputs/{zip_job_id}', None, 'files'),
+    ]
+
+
+def request(client, method, path, body):
+    # JSON requests, as sent by the API clients rather than the browser
+    if body is None:
+        response = client.open(path, method=method, content_type='application/json')
+    else:
+        response = client.open(path, method=method, json=body)
+    # Streamed responses (zip) are only produced when read
+    data = response.get_data()
+    if response.status_code != 200:
+        raise RuntimeError(f'{method} {path}: {response.status_code} {data[:200]!r}')
+    return len(data)
+
+
+def timeit(offline, client, case, repeat, cold):
+    name, method, path, body, _ = case
+    timings = []
+    for _ in range(repeat):
+        if cold:
+            offline.clear_caches()
+        start = time.perf_counter()
+        request(client, method, path, body)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def throughput(offline, case, clients, duration):
+    name, method, path, body, _ = case
+    counts = [0] * clients
+    deadline = time.perf_counter() + duration
+
+    def run(i):
+        client = offline.app.test_client()
+        while time.perf_counter() < deadline:
+            request(client, method, path, body)
+            counts[i] += 1
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jobs', type=int, default=1000, help='Jobs in the hive')
+    parser.add_argument('--species', type=int, default=10, help='Species per job result')
+    parser.add_argument('--datachecks', type=int, default=100, help='Datachecks per species')
+    parser.add_argument('--tests', type=int, default=5, help='Tests per datacheck')
+    parser.add_argument('--es-latency', type=float, default=0, help='Seconds added to each Elasticsearch request')
+    parser.add_argument('--repeat', type=int, default=20, help='Requests timed per endpoint, cold and warm')
+    parser.add_argument('--clients', type=int, default=8, help='Concurrent clients for the throughput')
+    parser.add_argument('--duration', type=float, default=2, help='Seconds of throughput measurement per endpoint')
+    parser.add_argument('--only', help='Only benchmark the endpoints whose name contains this text')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    offline = OfflineApp(jobs=args.jobs, species=args.species, datachecks=args.datachecks, tests=args.tests,
+                         es_latency=args.es_latency)
+    client = offline.app.test_client()
+    print(f'{args.jobs} jobs, results of {args.species} species x {args.datachecks} datachecks x {args.tests} tests, '
+          f'set up in {time.perf_counter() - start:.1f}s')
+    print(f'{"endpoint":<22}{"size KB":>9}{"cold ms":>9}{"warm ms":>9}{"warm p95":>10}{"req/s":>9}')
+    for case in cases(offline):
+        name, method, path, body, source = case
+        if args.only and args.only not in name:
+            continue
+        offline.main.app_es_data_source = source != 'files'
+        try:
+            size = request(client, method, path, body)
+            cold = timeit(offline, client, case, args.repeat, cold=True)
+            warm = timeit(offline, client, case, args.repeat, cold=False)
+            rate = throughput(offline, case, args.clients, args.duration)
+        finally:
+            offline.main.app_es_data_source = True
+        print(f'{name:<22}{size / 1024:>9.1f}{statistics.median(cold) * 1e3:>9.2f}'
+              f'{statistics.median(warm) * 1e3:>9.2f}{percentile(warm, 0.95) * 1e3:>10.2f}{rate:>9.0f}')
+
+
+if __name__ == '__main__':
+    main()
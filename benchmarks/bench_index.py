@@ -0,0 +1,137 @@
+# See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+"""
+Per-request latency of the catalog lookups (names / groups / types, their lists and search), comparing
+the previous full scans of the index dict with the precomputed DatacheckIndex.
+
+    python benchmarks/bench_index.py --scale 10
+"""
+import argparse
+import random
+import re
+import statistics
+import time
+
+from ensembl.production.datacheck.index import DatacheckIndex
+
+# Approximate size of the ensembl-datacheck index.json at the time of writing
+BASE_DATACHECKS = 400
+BASE_GROUPS = 40
+BASE_WORDS = 1000
+TYPES = ['critical', 'advisory']
+
+
+def synthetic_index(scale=10, seed=42):
+    rng = random.Random(seed)
+    words = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(3, 9)))
+             for _ in range(BASE_WORDS)]
+    groups = [f'{rng.choice(words)}_{i}' for i in range(BASE_GROUPS * scale)]
+    index = {}
+    while len(index) < BASE_DATACHECKS * scale:
+        name = ''.join(word.capitalize() for word in rng.sample(words, rng.randint(2, 4)))
+        index[name] = {
+            'name': name,
+            'description': ' '.join(rng.sample(words, rng.randint(5, 12))),
+            'datacheck_type': rng.choice(TYPES),
+            'groups': rng.sample(groups, rng.randint(1, 4)),
+            'package_name': f'Bio::EnsEMBL::DataCheck::Checks::{name}',
+        }
+    return index
+
+
+def scan_names(index, name_param=None):
+    if name_param is None:
+        return index
+    index_names = {}
+    for name, params in index.items():
+        if name == name_param:
+            index_names.setdefault(name, []).append(params)
+    return index_names
+
+
+def scan_groups(index, group_param=None):
+    index_groups = {}
+    for name, params in index.items():
+        for group in params['groups']:
+            if group_param is None or group == group_param:
+                index_groups.setdefault(group, []).append(params)
+    return index_groups
+
+
+def scan_types(index, type_param=None):
+    index_types = {}
+    for name, params in index.items():
+        if type_param is None or params['datacheck_type'] == type_param:
+            index_types.setdefault(params['datacheck_type'], []).append(params)
+    return index_types
+
+
+def scan_names_list(index):
+    return sorted(index)
+
+
+def scan_groups_list(index):
+    return sorted({group for params in index.values() for group in params['groups']})
+
+
+def scan_search(index, keyword):
+    index_search = {}
+    keyword_re = re.compile(keyword, re.IGNORECASE)
+    for name, params in index.items():
+        if keyword_re.search(name) or keyword_re.search(params['description']):
+            index_search.setdefault(keyword, []).append(params)
+    return index_search
+
+
+def timeit(func, *args, repeat=200):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1e6, max(timings) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=int, default=10, help='Multiple of the current index size')
+    parser.add_argument('--repeat', type=int, default=200, help='Iterations per measurement')
+    args = parser.parse_args()
+
+    raw = synthetic_index(args.scale)
+    start = time.perf_counter()
+    index = DatacheckIndex(raw)
+    build = (time.perf_counter() - start) * 1e3
+    name, group, dc_type = index.names_list[len(index) // 2], index.groups_list[0], TYPES[0]
+    words = ' '.join(raw[name]['description'].split()[:2])
+
+    cases = [
+        ('/names/<name>', (scan_names, raw, name), (index.by_name, name)),
+        ('/groups', (scan_groups, raw), (index.by_group,)),
+        ('/groups/<group>', (scan_groups, raw, group), (index.by_group, group)),
+        ('/types', (scan_types, raw), (index.by_type,)),
+        ('/types/<type>', (scan_types, raw, dc_type), (index.by_type, dc_type)),
+        ('/names/list', (scan_names_list, raw), (lambda: index.names_list,)),
+        ('/groups/list', (scan_groups_list, raw), (lambda: index.groups_list,)),
+        ('/search/<name>', (scan_search, raw, name[:-1]), (index.search, name[:-1], 50)),
+        ('/search/<words>', (scan_search, raw, words), (index.search, words, 50)),
+    ]
+    print(f'{len(index)} datachecks, {len(index.groups_list)} groups, index built in {build:.1f} ms')
+    print(f'{"endpoint":<20}{"scan median µs":>16}{"index median µs":>17}{"speedup":>10}')
+    for endpoint, scan, lookup in cases:
+        scan_median, _ = timeit(*scan, repeat=args.repeat)
+        lookup_median, _ = timeit(*lookup, repeat=args.repeat)
+        print(f'{endpoint:<20}{scan_median:>16.1f}{lookup_median:>17.2f}{scan_median / lookup_median:>9.0f}x')
+
+
+if __name__ == '__main__':
+    main()
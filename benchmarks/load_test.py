@@ -0,0 +1,105 @@
+# See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+"""
+Throughput and latency of a running datacheck service under concurrent clients. Each client sends requests
+back to back over its own keep-alive connection, picking the paths in turn, for the given duration.
+
+Compare the worker classes by running the service with each of them, e.g.
+
+    GUNICORN_WORKER_CLASS=sync gunicorn --config gunicorn_config.py ensembl.production.datacheck.app.main:app
+    GUNICORN_WORKER_CLASS=gthread gunicorn --config gunicorn_config.py ensembl.production.datacheck.app.main:app
+
+    python benchmarks/load_test.py http://localhost:5001 --clients 50 --duration 30 \\
+        --path '/jobs?limit=50' --path '/jobs/details?jsonfile=<path>' --path '/dropdown/databases/<host>/<port>?search=homo'
+"""
+import argparse
+import statistics
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+DEFAULT_PATHS = ['/ping', '/names/list', '/jobs?limit=50']
+
+
+def percentile(timings, p):
+    return timings[min(len(timings) - 1, int(p * len(timings)))]
+
+
+class Results:
+    """Durations and errors of the requests sent, by path"""
+
+    def __init__(self):
+        self.timings = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def add(self, path, duration, error):
+        with self._lock:
+            self.timings[path].append(duration)
+            if error:
+                self.errors[path] += 1
+
+    def report(self, elapsed, clients):
+        total = sum(len(timings) for timings in self.timings.values())
+        errors = sum(self.errors.values())
+        print(f'{clients} clients, {total} requests in {elapsed:.1f}s: {total / elapsed:.1f} req/s, {errors} errors')
+        print(f'{"path":<50}{"requests":>9}{"errors":>8}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"max ms":>9}')
+        for path, timings in sorted(self.timings.items()):
+            timings = sorted(timings)
+            print(f'{path[:49]:<50}{len(timings):>9}{self.errors[path]:>8}'
+                  f'{statistics.median(timings) * 1e3:>9.1f}{percentile(timings, 0.95) * 1e3:>9.1f}'
+                  f'{percentile(timings, 0.99) * 1e3:>9.1f}{timings[-1] * 1e3:>9.1f}')
+
+
+def client(base_url, paths, deadline, timeout, offset, results):
+    session = requests.Session()
+    i = offset
+    while time.monotonic() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            response = session.get(base_url + path, timeout=timeout)
+            error = response.status_code >= 500
+        except requests.exceptions.RequestException:
+            error = True
+        results.add(path, time.perf_counter() - start, error)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('base_url', help='Service root, e.g. http://localhost:5001')
+    parser.add_argument('--clients', type=int, default=50, help='Concurrent clients')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds the clients send requests')
+    parser.add_argument('--timeout', type=float, default=60, help='Seconds before a request is counted as failed')
+    parser.add_argument('--path', action='append', dest='paths',
+                        help=f'Path to request, repeated for several (default {" ".join(DEFAULT_PATHS)})')
+    args = parser.parse_args()
+
+    base_url = args.base_url.rstrip('/')
+    paths = args.paths or DEFAULT_PATHS
+    results = Results()
+    start = time.monotonic()
+    deadline = start + args.duration
+    threads = [threading.Thread(target=client, args=(base_url, paths, deadline, args.timeout, i, results))
+               for i in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.report(time.monotonic() - start, args.clients)
+
+
+if __name__ == '__main__':
+    main()
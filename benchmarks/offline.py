@@ -0,0 +1,235 @@
+# See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+"""
+The datacheck app without any external service, for the benchmarks: Elasticsearch is replaced by an in-memory
+connection answering the searches of the app, the hive by a SQLite database, and the datacheck index by a
+synthetic one. Jobs and result documents are generated with a configurable size.
+
+    from offline import OfflineApp
+    offline = OfflineApp(jobs=1000, species=10, datachecks=100, tests=5)
+    client = offline.app.test_client()
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from urllib.parse import unquote
+
+from bench_index import synthetic_index
+
+ROOT = Path(__file__).resolve().parents[1]
+ENS_VERSION = '110'
+STATUSES = ['DONE'] * 7 + ['FAILED', 'RUN', 'READY']
+
+
+def filter_response(response, filter_path):
+    """Keep the parts of a response selected by an Elasticsearch filter_path, in the order of the response"""
+    tree = {}
+    for path in filter_path.split(','):
+        node = tree
+        for key in path.split('.'):
+            node = node.setdefault(key, {})
+
+    def apply(value, node):
+        if not node:
+            return value
+        if isinstance(value, list):
+            values = [apply(item, node) for item in value]
+            return [item for item in values if item is not None] or None
+        if isinstance(value, dict):
+            kept = {key: apply(item, node[key]) for key, item in value.items() if key in node}
+            kept = {key: item for key, item in kept.items() if item is not None}
+            return kept or None
+        return None
+
+    return apply(response, tree) or {}
+
+
+def synthetic_content(rng, species, datachecks, tests, failed=0):
+    """Datacheck results of a job as stored in Elasticsearch: tests of each datacheck of each species"""
+    content = {}
+    for s in range(species):
+        content[f'species_{s}_core_{ENS_VERSION}_1'] = {
+            f'Datacheck{d}': {
+                'tests': {
+                    f'Test {t} of datacheck {d}: {rng.choice(["rows match", "no orphans", "values in range"])}':
+                        'not ok' if failed and t == 0 and d < failed else 'ok'
+                    for t in range(tests)
+                },
+                'passed': 0 if failed and d < failed else 1,
+            } for d in range(datachecks)
+        }
+    return content
+
+
+class OfflineApp:
+    """
+    Datacheck app set up with stand-ins for all its external services. The app module is imported by the
+    first instance, with the configuration of the stand-ins: only one instance can be created per process.
+
+    Args:
+        jobs (int): number of jobs in the hive
+        species (int): species per job result
+        datachecks (int): datachecks per species
+        tests (int): tests per datacheck
+        seed (int): random seed of the synthetic data
+        es_latency (float): seconds added to each Elasticsearch request
+        workdir (str): where the SQLite hive, the index cache and the job outputs are written
+    """
+
+    def __init__(self, jobs=1000, species=10, datachecks=100, tests=5, seed=42, es_latency=0, workdir=None):
+        self.workdir = Path(workdir or tempfile.mkdtemp(prefix='datacheck_bench_'))
+        self.rng = random.Random(seed)
+        self.index = synthetic_index(scale=1, seed=seed)
+        self._configure()
+        from ensembl.production.datacheck.app import main
+        from ensembl.production.datacheck import utils
+        self.main = main
+        self.app = main.app
+        self.es = utils.MeteredConnection = fake_es_connection_class()
+        self.es.latency = es_latency
+        utils.reset_es_clients()
+        main.app_es_data_source = True
+        self.jsonfiles = {}
+        self.output_dirs = {}
+        self._seed_hive(jobs, species, datachecks, tests)
+
+    def _configure(self):
+        cache_dir = self.workdir / 'index_cache'
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        with open(cache_dir / f'index_{ENS_VERSION}.json', 'w') as f:
+            json.dump({'url': None, 'etag': None, 'last_modified': None, 'index': self.index}, f)
+        os.environ.update({
+            'DATACHECK_CONFIG_PATH': str(ROOT / 'src' / 'tests' / 'datachecks_config.yaml'),
+            'SERVER_NAMES': str(ROOT / 'server_names.json'),
+            'ENS_VERSION': ENS_VERSION,
+            'DATACHECK_INDEX_CACHE_DIR': str(cache_dir),
+            'HIVE_URI': f"sqlite:///{self.workdir / 'hive.db'}",
+            'APP_ES_DATA_SOURCE': 'true',
+        })
+        sys.path.insert(0, str(ROOT / 'src'))
+        from ensembl.production.datacheck.config import DCConfigLoader
+        # The synthetic index is never revalidated against GitHub
+        DCConfigLoader.fetch = classmethod(lambda cls, version, cached=None: None)
+
+    def _seed_hive(self, jobs, species, datachecks, tests):
+        from ensembl.production.core.models.hive import Analysis, Base, Job, Result, Session
+        from ensembl.production.core.perl_utils import dict_to_perl_string
+        hive = self.main.get_hive()
+        Base.metadata.drop_all(hive.engine)
+        Base.metadata.create_all(hive.engine)
+        analysis = self.app.analysis
+        # Results are the same size for all jobs: share them rather than generating each
+        contents = {failed: synthetic_content(self.rng, species, datachecks, tests, failed) for failed in (0, 2)}
+        with Session() as session:
+            session.add(Analysis(analysis_id=1, logic_name=analysis))
+            for job_id in range(1, jobs + 1):
+                status = self.rng.choice(STATUSES)
+                dbnames = [f'species_{s}_core_{ENS_VERSION}_1' for s in range(species)]
+                input_data = {
+                    'dbname': dbnames,
+                    'datacheck_names': sorted(self.rng.sample(sorted(self.index), 3)),
+                    'tag': self.rng.choice(['release', 'handover', 'pre-release checks']),
+                    'email': 'user@ebi.ac.uk',
+                    'timestamp': time.strftime('%a %b %d %H:%M:%S %Y', time.gmtime(1.6e9 + job_id * 60)),
+                }
+                session.add(Job(job_id=job_id, analysis_id=1, status=status,
+                                input_id=dict_to_perl_string(input_data)))
+                if status == 'DONE':
+                    failed = self.rng.choice([0, 0, 0, 2])
+                    jsonfile = f'/datachecks/output/job_{job_id}/results_by_species.json'
+                    output_dir = self.workdir / 'output' / f'job_{job_id}'
+                    session.add(Result(job_id=job_id, output=json.dumps({
+                        'failed_total': failed,
+                        'passed_total': species * datachecks - failed,
+                        'skipped_total': 0,
+                        'json_output_file': jsonfile,
+                        'output_dir': str(output_dir),
+                    })))
+                    report_time = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(1.6e9 + job_id * 60 + 3600))
+                    self.es.documents[jsonfile] = (report_time, contents[failed])
+                    self.jsonfiles[job_id] = jsonfile
+                    self.output_dirs[job_id] = (output_dir, contents[failed])
+            session.commit()
+
+    def write_outputs(self, job_id):
+        """Write the output files of a job (one per species), as the pipeline does, for zip downloads"""
+        output_dir, content = self.output_dirs[job_id]
+        output_dir.mkdir(parents=True, exist_ok=True)
+        for dbname, results in content.items():
+            with open(output_dir / f'{dbname}.json', 'w') as f:
+                json.dump(results, f, indent=2)
+        return output_dir
+
+    def clear_caches(self):
+        from ensembl.production.datacheck.cache import caches
+        for cache in caches.values():
+            cache.clear()
+
+
+def fake_es_connection_class():
+    """Connection class of the fake Elasticsearch, defined once the app is configured (see OfflineApp)"""
+    from ensembl.production.datacheck.utils import MeteredConnection
+
+    class FakeESConnection(MeteredConnection):
+        """Elasticsearch connection answering the searches of the app from documents held in memory"""
+
+        # Latest report of each datacheck results file: (report_time, content)
+        documents = {}
+        # Seconds added to each request, standing for the network and search time of a real cluster
+        latency = 0
+
+        def perform_request(self, method, url, params=None, body=None, timeout=None, ignore=(), headers=None):
+            start = time.perf_counter()
+            params = params or {}
+            path = url.split('?', 1)[0]
+            if isinstance(body, bytes):
+                body = body.decode('utf-8')
+            if path.endswith('/_msearch'):
+                lines = [json.loads(line) for line in body.splitlines() if line.strip()]
+                response = {'responses': [dict(self.search(query), status=200) for query in lines[1::2]]}
+            elif path.endswith('/_search'):
+                response = self.search(json.loads(body))
+            elif path.endswith('/_source'):
+                response = {'content': self.documents[unquote(path.split('/')[-2])][1]}
+            else:
+                response = {'tagline': 'You Know, for Search'}
+            filter_path = params.get('filter_path')
+            if filter_path:
+                # Query parameters are encoded by the client
+                response = filter_response(response, filter_path.decode('utf-8') if isinstance(filter_path, bytes)
+                                           else filter_path)
+            data = json.dumps(response, separators=(',', ':'))
+            if self.latency:
+                time.sleep(self.latency)
+            self.log_request_success(method, url, path, body, 200, data, time.perf_counter() - start)
+            return 200, {'content-type': 'application/json'}, data
+
+        def search(self, query):
+            jsonfile = query['query']['term']['file.keyword']
+            hits = []
+            if jsonfile in self.documents:
+                report_time, content = self.documents[jsonfile]
+                source = query.get('_source', True)
+                hit = {'_index': 'datacheck_results', '_type': '_doc', '_id': jsonfile, '_score': None}
+                if source:
+                    document = {'file': jsonfile, 'report_time': report_time, 'content': content}
+                    hit['_source'] = {key: document[key] for key in source} if isinstance(source, list) else document
+                hit['sort'] = [report_time]
+                hits.append(hit)
+            return {'took': 1, 'timed_out': False, 'hits': {'total': len(hits), 'max_score': None, 'hits': hits}}
+
+    return FakeESConnection
+
@@ -0,0 +1,163 @@
+# See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+"""
+Replay recorded traffic against a running datacheck service, and report the latency of each route.
+
+Requests are read from a gunicorn access log (in the access_log_format of gunicorn_config.py) or from a JSONL file
+of {"time": <epoch seconds>, "method": "GET", "path": "/jobs?limit=25", "body": <optional JSON>} objects. They are
+sent at their original pace, scaled by --speed (2 for twice as fast, 0 for as fast as possible), by at most
+--concurrency clients at once. Access logs have a one second resolution: the requests logged within a second are
+spread over it. Only GET requests are replayed by default, as access logs do not record bodies and POST requests
+submit jobs.
+
+    python benchmarks/replay.py http://localhost:5001 access.log --speed 4 --concurrency 50
+"""
+import argparse
+import json
+import queue
+import re
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+import requests
+
+from load_test import Results, percentile
+
+LOG_LINE = re.compile(r'^\S+ \S+ \S+ \[(?P<time>[^\]]+)\] "(?P<method>[A-Z]+) (?P<path>\S+)[^"]*" (?P<status>\d{3}) ')
+# Path segments that are parameters of the routes, replaced by a placeholder in the report
+ROUTE_PARAMETERS = [
+    (re.compile(r'^/(names|groups|types|search)/[^/]+$'), r'/\1/<param>'),
+    (re.compile(r'^/dropdown/databases/[^/]+/[^/]+$'), '/dropdown/databases/<host>/<port>'),
+    (re.compile(r'/\d+(?=/|$)'), '/<id>'),
+]
+
+
+class RecordedRequest(NamedTuple):
+    time: float
+    method: str
+    path: str
+    body: Optional[object] = None
+
+
+def route(path):
+    """Route of a request path, e.g. /jobs/<id> for /jobs/42?format=json"""
+    path = path.split('?', 1)[0].rstrip('/') or '/'
+    for pattern, replacement in ROUTE_PARAMETERS:
+        path = pattern.sub(replacement, path)
+    return path
+
+
+def parse_access_log(lines):
+    by_second = defaultdict(list)
+    for line in lines:
+        match = LOG_LINE.match(line)
+        if match is None:
+            continue
+        logged_at = datetime.strptime(match['time'], '%d/%b/%Y:%H:%M:%S %z').timestamp()
+        by_second[logged_at].append((match['method'], match['path']))
+    recorded = []
+    for second, logged in sorted(by_second.items()):
+        recorded.extend(RecordedRequest(second + i / len(logged), method, path)
+                        for i, (method, path) in enumerate(logged))
+    return recorded
+
+
+def parse_jsonl(lines):
+    recorded = []
+    for line in lines:
+        if line.strip():
+            entry = json.loads(line)
+            recorded.append(RecordedRequest(float(entry['time']), entry.get('method', 'GET'), entry['path'],
+                                            entry.get('body')))
+    return sorted(recorded, key=lambda request: request.time)
+
+
+def load_requests(path):
+    """Recorded requests of an access log or JSONL file, in time order"""
+    with open(path) as f:
+        lines = f.readlines()
+    first = next((line for line in lines if line.strip()), '')
+    return parse_jsonl(lines) if first.lstrip().startswith('{') else parse_access_log(lines)
+
+
+def replay(recorded, base_url, speed, concurrency, timeout):
+    """Send the requests at their recorded pace, returning their Results by route and the delays in sending them"""
+    results = Results()
+    delays = []
+    pending = queue.Queue()
+
+    def client():
+        session = requests.Session()
+        while True:
+            item = pending.get()
+            if item is None:
+                return
+            request, due = item
+            start = time.perf_counter()
+            delays.append(max(0.0, start - due))
+            try:
+                response = session.request(request.method, base_url + request.path, json=request.body, timeout=timeout)
+                error = response.status_code >= 500
+            except requests.exceptions.RequestException:
+                error = True
+            name = route(request.path) if request.method == 'GET' else f'{request.method} {route(request.path)}'
+            results.add(name, time.perf_counter() - start, error)
+
+    clients = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in clients:
+        thread.start()
+    start = time.perf_counter()
+    first = recorded[0].time if recorded else 0
+    for request in recorded:
+        due = start + ((request.time - first) / speed if speed else 0)
+        wait = due - time.perf_counter()
+        if wait > 0:
+            time.sleep(wait)
+        pending.put((request, due))
+    for _ in clients:
+        pending.put(None)
+    for thread in clients:
+        thread.join()
+    return results, delays, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('base_url', help='Service root, e.g. http://localhost:5001')
+    parser.add_argument('recording', help='gunicorn access log, or JSONL file of requests')
+    parser.add_argument('--speed', type=float, default=1, help='Pace relative to the recording, 0 for no wait')
+    parser.add_argument('--concurrency', type=int, default=50, help='Maximum number of requests at once')
+    parser.add_argument('--timeout', type=float, default=60, help='Seconds before a request is counted as failed')
+    parser.add_argument('--methods', default='GET,HEAD', help='Methods replayed, comma separated')
+    parser.add_argument('--limit', type=int, help='Only replay the first requests')
+    args = parser.parse_args()
+
+    methods = {method.strip().upper() for method in args.methods.split(',')}
+    recorded = [request for request in load_requests(args.recording) if request.method in methods][:args.limit]
+    if not recorded:
+        parser.error(f'No {"/".join(sorted(methods))} request found in {args.recording}')
+    span = recorded[-1].time - recorded[0].time
+    print(f'Replaying {len(recorded)} requests recorded over {span:.0f}s'
+          f'{f" at x{args.speed:g}" if args.speed else " without waiting"}, at most {args.concurrency} at once')
+    results, delays, elapsed = replay(recorded, args.base_url.rstrip('/'), args.speed, args.concurrency, args.timeout)
+    results.report(elapsed, args.concurrency)
+    delays.sort()
+    # Requests sent late: the clients could not keep up with the recorded pace
+    print(f'Sending delay: p50 {percentile(delays, 0.5) * 1e3:.1f} ms, p99 {percentile(delays, 0.99) * 1e3:.1f} ms, '
+          f'max {delays[-1] * 1e3:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
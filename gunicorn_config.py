@@ -29,7 +29,10 @@
 #       range.
 #
 
+import glob
 import os
+import tempfile
+
 bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5001")
 backlog = int(os.getenv("GUNICORN_BACKLOG", "2048"))
 
@@ -76,12 +79,64 @@ backlog = int(os.getenv("GUNICORN_BACKLOG", "2048"))
 #
 #       A positive integer. Generally set in the 1-5 seconds range.
 #
+#   threads - The number of worker threads for handling requests,
+#       with the gthread worker class.
+#
+#       Most requests wait on Elasticsearch, the hive database, the
+#       dbcopy service or GitHub, so each worker serves several of
+#       them at once with threads (gthread, the default). Keep the
+#       threads within the connection pools of a worker (HIVE_POOL_SIZE
+#       + HIVE_MAX_OVERFLOW, ES_POOL_MAXSIZE, COPY_POOL_MAXSIZE).
+#       GUNICORN_WORKER_CLASS=sync restores one request per worker.
+#
+#       Job progress event streams (/jobs/<id>/events) hold a thread
+#       for up to SSE_MAX_DURATION seconds (25) each. A worker opens
+#       at most SSE_MAX_STREAMS (4) of them at once, and answers
+#       others with a 503, after which the job list is polled
+#       instead: keep SSE_MAX_STREAMS well below the threads, so that
+#       streams leave threads for the other requests (set it to 0
+#       with sync workers, whose only thread a stream would hold).
+#
+
+
 
-workers = 2
-worker_class = 'sync'
+def cpu_count():
+    """CPUs available to this process, within the container CPU quota if there is one (cgroup v2)"""
+    try:
+        count = len(os.sched_getaffinity(0))
+    except AttributeError:
+        count = os.cpu_count() or 1
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as cpu_max:
+            quota, period = cpu_max.read().split()
+        if quota != 'max':
+            count = min(count, max(1, int(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return count
+
+
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+# Threaded workers each serve several requests: one per CPU is enough, sync ones the usual 2 x CPUs + 1
+default_workers = cpu_count() if worker_class == 'gthread' else 2 * cpu_count() + 1
+workers = int(os.getenv("GUNICORN_WORKERS", os.getenv("WEB_CONCURRENCY", default_workers)))
+# More than one thread turns sync workers into gthread ones
+threads = int(os.getenv("GUNICORN_THREADS", "8" if worker_class == 'gthread' else "1"))
 worker_connections = 1000
-timeout = 30
-keepalive = 2
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "2"))
+
+#
+#   PROMETHEUS_MULTIPROC_DIR - Directory where the workers write their
+#       metrics, aggregated by /metrics. It must be set before the
+#       app is loaded, and is emptied when the server starts so that
+#       metrics of a previous run are not reported.
+#
+
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "datacheck_metrics"))
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+for metrics_file in glob.glob(os.path.join(os.environ["PROMETHEUS_MULTIPROC_DIR"], "*.db")):
+    os.remove(metrics_file)
 
 #
 #   spew - Install a trace function that spews every line of Python
@@ -93,6 +148,19 @@ keepalive = 2
 
 spew = False
 
+#
+#   preload_app - Load the application before forking the workers.
+#
+#       The datacheck index and server names are then loaded once
+#       and shared copy-on-write by the workers, rather than each
+#       worker loading its own. Connections are opened by each
+#       worker after the fork (see post_fork).
+#
+#       True or False
+#
+
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() in ('1', 'true', 'yes')
+
 #
 # Server mechanics
 #
@@ -200,6 +268,10 @@ access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s"
 
 def post_fork(server, worker):
     server.log.info("Worker spawned (pid: %s)", worker.pid)
+    # Drop the connections inherited from the master, restart the catalog polling and warm up the worker
+    # before it accepts requests
+    from ensembl.production.datacheck.app.main import init_worker
+    init_worker()
 
 def pre_fork(server, worker):
     pass
@@ -208,6 +280,14 @@ def pre_exec(server):
     server.log.info("Forked child, re-executing.")
 
 def when_ready(server):
+    if preload_app:
+        # Fork the workers with the revalidated datacheck index, then keep the objects loaded so far out of the
+        # garbage collections, which would otherwise write to their memory pages and copy them in every worker.
+        # A revalidation still running after the timeout is started again in each worker (see Catalog.after_fork).
+        import gc
+        from ensembl.production.datacheck.app.main import app
+        app.catalog_revalidation.join(float(os.getenv("GUNICORN_PRELOAD_TIMEOUT", "15")))
+        gc.freeze()
     server.log.info("Server is ready. Spawning workers")
 
 def worker_int(worker):
@@ -229,3 +309,9 @@ def worker_int(worker):
 
 def worker_abort(worker):
     worker.log.info("worker received SIGABRT signal")
+
+
+def child_exit(server, worker):
+    # Stop reporting the gauges of the worker (requests in progress)
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
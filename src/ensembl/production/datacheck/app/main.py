@@ -9,19 +9,21 @@
 #    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 #    See the License for the specific language governing permissions and
 #    limitations under the License.
+import functools
+import hmac
 import os
 import re
-from io import BytesIO
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from zipfile import ZipFile
 
 import requests
-from ensembl.production.core.db_utils import get_databases_list, get_db_type
+from ensembl.production.core.db_utils import get_databases_list
 from ensembl.production.core.exceptions import HTTPRequestError
-from ensembl.production.core.models.hive import HiveInstance
 from ensembl.production.core.server_utils import assert_mysql_uri, assert_mysql_db_uri
 from flasgger import Swagger
-from flask import Flask, json, jsonify, render_template, request, send_file, redirect, flash, url_for
+from flask import Flask, g, json, jsonify, render_template, request, send_file, stream_with_context, redirect, flash, url_for
 from flask_bootstrap import Bootstrap4
 from flask_cors import CORS
 from requests.exceptions import HTTPError
@@ -29,10 +31,22 @@ from werkzeug.middleware.dispatcher import DispatcherMiddleware
 from werkzeug.wrappers import Response
 
 import ensembl.production.datacheck.exceptions
-from ensembl.production.datacheck.config import DatacheckConfig
-from ensembl.production.datacheck.exceptions import MissingIndexException
+from ensembl.production.datacheck.cache import caches
+from ensembl.production.datacheck.catalog import Catalog
+from ensembl.production.datacheck.config import DatacheckConfig, DCConfigLoader, get_server_names
+from ensembl.production.datacheck.databases import DatabaseCatalogues
+from ensembl.production.datacheck.dbcopy import DbCopyClient
+from ensembl.production.datacheck.events import JobWatcher, job_event_stream
+from ensembl.production.datacheck.exceptions import MissingIndexException, SearchTimeoutException
 from ensembl.production.datacheck.forms import DatacheckSubmissionForm
-from ensembl.production.datacheck.utils import get_datacheck_results, qualified_name
+from ensembl.production.datacheck.hive import create_jobs, get_hive_instance, get_job_result, get_jobs_page, get_jobs_since, \
+    reset_hive_instance, statuses, terminal_statuses
+from ensembl.production.datacheck.metrics import backend_timer, latest as latest_metrics, request_duration, \
+    requests_in_progress
+from ensembl.production.datacheck.profiling import RequestProfile
+from ensembl.production.datacheck.search import regex_search
+from ensembl.production.datacheck.utils import get_datacheck_results, get_datacheck_results_batch, get_es_client, \
+    qualified_name, reset_es_clients, resolve_db_type, stream_zip
 
 # Go up two levels to get to root, where we will find the static and template files
 app_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -51,15 +65,8 @@ CORS(app)
 Swagger(app, template_file=app.config['SWAGGER_FILE'])
 
 app.analysis = app.config['HIVE_ANALYSIS']
-app.index = app.config['DATACHECK_INDEX']
-app.server_names = app.config['SERVER_NAMES']
 app.url_map.strict_slashes = False
 
-app.names_list = []
-app.groups_list = []
-app.servers_list = []
-app.servers_dict = {}
-
 # set es details
 es_host = app.config['ES_HOST']
 es_port = int(app.config['ES_PORT'])
@@ -77,58 +84,194 @@ if app.debug:
     )
 
 
+def load_index():
+    with backend_timer('github', 'datacheck_index'):
+        return DCConfigLoader.refresh(app.config['ENS_VERSION'], app.config['DATACHECK_INDEX_CACHE_DIR'])
+
+
+def load_server_names():
+    # Fetched from dbcopy if GET_SERVER_NAMES is set, read from the SERVER_NAMES file otherwise
+    flag = app.config['GET_SERVER_NAMES']
+    with backend_timer('dbcopy' if flag else 'file', 'server_names'):
+        return get_server_names(app.config['COPY_URI_DROPDOWN'], flag)
+
+
+app.catalog = Catalog(app.config['DATACHECK_INDEX'], app.config['SERVER_NAMES'],
+                      index_loader=load_index, servers_loader=load_server_names)
+# The index was read from the on-disk cache: revalidate it without holding up startup
+app.catalog_revalidation = app.catalog.reload_in_background(servers=False)
+if app.config['CATALOG_RELOAD_INTERVAL'] > 0:
+    app.catalog.start_polling(app.config['CATALOG_RELOAD_INTERVAL'])
+
+
+def endpoint_label():
+    # Requests not matching any route share a label, rather than one per URL
+    return request.endpoint or 'unmatched'
+
+
+@app.before_request
+def start_request_metrics():
+    g.request_start = time.perf_counter()
+    requests_in_progress.labels(endpoint_label()).inc()
+
+
+@app.after_request
+def record_request_metrics(response):
+    # Streamed responses (events, zip downloads) are timed until their first byte
+    if 'request_start' in g:
+        request_duration.labels(endpoint_label(), request.method, response.status_code) \
+            .observe(time.perf_counter() - g.request_start)
+    return response
+
+
+@app.teardown_request
+def end_request_metrics(exception=None):
+    if 'request_start' in g:
+        requests_in_progress.labels(endpoint_label()).dec()
+
+
+# cProfile cannot profile concurrent requests (threads) of a worker: only one is profiled at a time
+profiling_lock = threading.Lock()
+
+
+def profiling_requested():
+    flag = request.headers.get('X-Profile', request.args.get('profile'))
+    if not app.config['PROFILING_ENABLED'] or flag is None:
+        return False
+    return flag == app.config['PROFILING_TOKEN'] if app.config['PROFILING_TOKEN'] else True
+
+
+@app.before_request
+def start_profiling():
+    if profiling_requested() and profiling_lock.acquire(blocking=False):
+        route = request.url_rule.rule if request.url_rule is not None else request.path
+        try:
+            g.profile = RequestProfile(app.config['PROFILING_DIR'], route, app.config['PROFILING_FORMAT']).__enter__()
+        except Exception:
+            profiling_lock.release()
+            raise
+
+
+@app.after_request
+def stop_profiling(response):
+    profile = g.pop('profile', None)
+    if profile is not None:
+        try:
+            response.headers['X-Profile'] = os.path.basename(profile.stop())
+        finally:
+            profiling_lock.release()
+    return response
+
+
+@app.teardown_request
+def abort_profiling(exception=None):
+    # Request ended without a response (unhandled exception)
+    profile = g.pop('profile', None)
+    if profile is not None:
+        try:
+            profile.stop()
+        finally:
+            profiling_lock.release()
+
+
 @app.context_processor
 def inject_configs():
     return dict(script_name=app.config['SCRIPT_NAME'],
                 css_url=f"css/{app.config['DATACHECK_TYPE']}.css")
 
 
-def get_names_list():
-    if not app.index:
+def get_snapshot():
+    # Pin the catalog snapshot for the duration of the request, so a concurrent reload cannot mix versions
+    if 'catalog_snapshot' not in g:
+        g.catalog_snapshot = app.catalog.snapshot
+    return g.catalog_snapshot
+
+
+def get_index():
+    index = get_snapshot().index
+    if not index:
         # Empty list of compara
         raise MissingIndexException
+    return index
 
-    if not app.names_list:
-        for name, params in app.index.items():
-            app.names_list.append(name)
-        app.names_list.sort()
-    return app.names_list
 
+def get_names_list():
+    return get_index().names_list
 
-def get_groups_list():
-    if not app.index:
-        # Empty list of compara
-        raise MissingIndexException
 
-    if not app.groups_list:
-        groups_set = []
-        for name, params in app.index.items():
-            for group in params['groups']:
-                groups_set.append(group)
-        app.groups_list = sorted(set(groups_set))
-    return app.groups_list
+def get_groups_list():
+    return get_index().groups_list
 
 
 def get_servers_list():
-    if not app.servers_list:
-        app.servers_list = sorted(set(app.server_names))
-    return app.servers_list
+    return get_snapshot().servers_list
 
 
 def get_servers_dict():
-    if not app.servers_dict:
-        app.servers_dict = app.server_names
-    return app.servers_dict
-
+    return get_snapshot().server_names
+
+
+def catalog_cache(view):
+    """
+    Conditional GET support for endpoints that only depend on the catalog: responses carry a strong ETag
+    derived from the catalog snapshot, and a matching If-None-Match is answered with a 304 without
+    building the response.
+    """
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        # Some endpoints render HTML or JSON for the same URL
+        etag = f"{get_snapshot().digest}-{'json' if request.is_json else 'html'}"
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+        else:
+            response = app.make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = app.config['CATALOG_CACHE_MAX_AGE']
+        response.vary.add('Content-Type')
+        return response
 
-hive = None
+    return wrapper
 
 
 def get_hive():
-    global hive
-    if hive is None:
-        hive = HiveInstance(app.config['HIVE_URI'])
-    return hive
+    return get_hive_instance(app.config['HIVE_URI'], app.config['HIVE_READ_URI'])
+
+
+def init_worker():
+    """
+    Prepare a worker process, forked from a preloaded app or not, before it serves requests: connections
+    inherited from the parent are dropped, the catalog lock and polling thread (which do not survive a fork) are
+    reset and restarted, and the worker connections and caches are warmed up for up to WORKER_WARMUP_TIMEOUT
+    seconds.
+    """
+    reset_es_clients()
+    reset_hive_instance()
+    app.catalog.after_fork()
+    if app.config['CATALOG_RELOAD_INTERVAL'] > 0:
+        app.catalog.start_polling(app.config['CATALOG_RELOAD_INTERVAL'])
+    warmup = threading.Thread(target=warm_up, name='datacheck-warmup', daemon=True)
+    warmup.start()
+    warmup.join(app.config['WORKER_WARMUP_TIMEOUT'])
+    return warmup
+
+
+def warm_up():
+    """Open the hive and Elasticsearch connections of the worker, and cache the first page of the job list"""
+    start = time.perf_counter()
+    try:
+        hive = get_hive()
+        if hive.read_engine is not hive.engine:
+            hive.engine.connect().close()
+        get_jobs_page(hive, app.analysis, limit=app.config['WORKER_WARMUP_JOBS'])
+    except Exception as e:
+        app.logger.warning("Unable to warm up the hive connections: %s", e)
+    if not get_es_client(es_host, es_port, es_user, es_password, es_ssl).ping():
+        app.logger.warning("Unable to warm up the Elasticsearch connections")
+    app.logger.info("Worker warmed up in %.2fs", time.perf_counter() - start)
 
 
 @app.route('/', methods=['GET'])
@@ -137,6 +280,7 @@ def index():
 
 
 @app.route('/servers/list', methods=['GET'])
+@catalog_cache
 def servers_list():
     return jsonify(get_servers_list())
 
@@ -152,32 +296,67 @@ def config():
     )
 
 
+@app.route('/catalog', methods=['GET'])
+def catalog():
+    snapshot = app.catalog.snapshot
+    return jsonify({'version': snapshot.version,
+                    'loaded_at': snapshot.loaded_at,
+                    'ens_version': app.config['ENS_VERSION'],
+                    'datachecks': len(snapshot.index),
+                    'servers': len(snapshot.servers_list)})
+
+
+@app.route('/catalog/reload', methods=['POST'])
+def catalog_reload():
+    token = app.config['CATALOG_RELOAD_TOKEN']
+    if not token or not hmac.compare_digest(request.headers.get('X-Reload-Token', ''), token):
+        return jsonify(error='Catalog reload is disabled, or the X-Reload-Token header is missing or wrong'), 403
+    # Reload off the request path; the new snapshot is picked up by the next requests once published. Only the
+    # worker serving this request is reloaded: the others reload on their CATALOG_RELOAD_INTERVAL.
+    app.catalog.reload_in_background()
+    return jsonify({'version': app.catalog.snapshot.version, 'reloading': True, 'worker': os.getpid()}), 202
+
+
 @app.route('/servers/dict', methods=['GET'])
+@catalog_cache
 def servers_dict():
     return jsonify(get_servers_dict())
 
 
+def load_databases(server_uri):
+    with backend_timer('mysql', 'databases_list'):
+        return get_databases_list(server_uri, None)
+
+
+database_catalogues = DatabaseCatalogues(load_databases,
+                                         ttl=DatacheckConfig.DATABASES_CACHE_TTL,
+                                         max_stale=DatacheckConfig.DATABASES_CACHE_MAX_STALE)
+
+
 @app.route('/databases/list', methods=['GET'])
 def databases_list():
     db_uri = request.args.get('db_uri')
     query = request.args.get('query')
-    return jsonify(get_databases_list(qualified_name(db_uri), query))
+    prefix = request.args.get('prefix')
+    limit = request.args.get('limit', None, type=int)
+    if not db_uri:
+        return jsonify({'error': "Missing db_uri parameter"}), 400
+    if limit is not None and limit < 0:
+        return jsonify({'error': f"Invalid limit {limit}: expected a positive number"}), 400
+    catalogue = database_catalogues.get(qualified_name(db_uri))
+    if prefix is not None:
+        return jsonify(catalogue.prefix(prefix, limit))
+    try:
+        return jsonify(catalogue.search(query, limit, app.config['SEARCH_REGEX_TIMEOUT']))
+    except re.error as e:
+        return jsonify({'error': f"Invalid query {query}: {e}"}), 400
 
 
 @app.route('/names/', methods=['GET'])
 @app.route('/names/<string:name_param>', methods=['GET'])
+@catalog_cache
 def names(name_param=None):
-    if not app.index:
-        # Empty list of compara
-        raise MissingIndexException
-
-    if name_param is None:
-        index_names = app.index
-    else:
-        index_names = {}
-        for name, params in app.index.items():
-            if name == name_param:
-                index_names.setdefault(name, []).append(params)
+    index_names = get_index().by_name(name_param)
 
     if request.is_json:
         return jsonify(index_names)
@@ -189,22 +368,16 @@ def names(name_param=None):
 
 
 @app.route('/names/list', methods=['GET'])
+@catalog_cache
 def names_list():
     return jsonify(get_names_list())
 
 
 @app.route('/groups/', methods=['GET'])
 @app.route('/groups/<string:group_param>', methods=['GET'])
+@catalog_cache
 def groups(group_param=None):
-    index_groups = {}
-    if not app.index:
-        # Empty list of compara
-        raise MissingIndexException
-
-    for name, params in app.index.items():
-        for group in params['groups']:
-            if group_param is None or group == group_param:
-                index_groups.setdefault(group, []).append(params)
+    index_groups = get_index().by_group(group_param)
 
     if request.is_json:
         return jsonify(index_groups)
@@ -216,21 +389,16 @@ def groups(group_param=None):
 
 
 @app.route('/groups/list', methods=['GET'])
+@catalog_cache
 def groups_list():
     return jsonify(get_groups_list())
 
 
 @app.route('/types/', methods=['GET'])
 @app.route('/types/<string:type_param>', methods=['GET'])
+@catalog_cache
 def types(type_param=None):
-    index_types = {}
-    if not app.index:
-        # Empty list of compara
-        raise MissingIndexException
-
-    for name, params in app.index.items():
-        if type_param is None or params['datacheck_type'] == type_param:
-            index_types.setdefault(params['datacheck_type'], []).append(params)
+    index_types = get_index().by_type(type_param)
 
     if request.is_json:
         return jsonify(index_types)
@@ -243,41 +411,107 @@ def types(type_param=None):
 
 @app.route('/search/<string:keyword>', methods=['GET'])
 def search(keyword):
-    index_search = {}
-    keyword_re = re.compile(keyword, re.IGNORECASE)
+    index = get_index()
+    limit = request.args.get('limit', app.config['SEARCH_RESULT_LIMIT'], type=int)
+    if limit < 0:
+        return jsonify(error=f"Invalid limit {limit}: expected a positive number"), 400
+    if request.args.get('mode') == 'regex':
+        try:
+            results = regex_search(index.datachecks, keyword, app.config['SEARCH_REGEX_TIMEOUT'], limit)
+        except re.error as e:
+            return jsonify(error=f"Invalid regular expression '{keyword}': {e}"), 400
+    else:
+        results = index.search(keyword, limit)
 
-    for name, params in app.index.items():
-        if keyword_re.search(name) or keyword_re.search(params['description']):
-            index_search.setdefault(keyword, []).append(params)
+    index_search = {keyword: results} if results else {}
     return jsonify(index_search)
 
 
+dbcopy_client = DbCopyClient(DatacheckConfig.COPY_URI_DROPDOWN,
+                             timeout=DatacheckConfig.COPY_TIMEOUT,
+                             ttl=DatacheckConfig.COPY_CACHE_TTL,
+                             max_entries=DatacheckConfig.COPY_CACHE_SIZE,
+                             pool_maxsize=DatacheckConfig.COPY_POOL_MAXSIZE)
+
+
 @app.route('/dropdown/databases/<string:src_host>/<string:src_port>', methods=['GET'])
 def dropdown(src_host=None, src_port=None):
+    search = request.args.get('search', None)
+    if not search:
+        return jsonify([])
     try:
-        search = request.args.get('search', None)
-        if src_host and src_port and search:
-            res = requests.get(f"{DatacheckConfig.COPY_URI_DROPDOWN}api/dbcopy/databases/{src_host}/{src_port}",
-                               params={'search': search})
-            res.raise_for_status()
-            return jsonify(res.json())
-        else:
-            raise Exception('required params not provided')
+        return jsonify(dbcopy_client.databases(src_host, src_port, search))
     except HTTPError as http_err:
         raise HTTPRequestError(f'{http_err}', 404)
-    except Exception as e:
-        return jsonify([])
+    except requests.exceptions.Timeout as e:
+        app.logger.warning("dbcopy timed out listing databases of %s:%s: %s", src_host, src_port, e)
+        return jsonify(error=f"Database list timed out: {e}"), 504
+    except (requests.exceptions.RequestException, ValueError) as e:
+        app.logger.error("dbcopy failed listing databases of %s:%s: %s", src_host, src_port, e)
+        return jsonify(error=f"Database list unavailable: {e}"), 502
+
+
+@app.route('/dropdown/stats', methods=['GET'])
+def dropdown_stats():
+    return jsonify(dbcopy_client.latency.stats())
 
 
 @app.route('/jobs', methods=['POST'])
 def job_submit(payload=None):
+    if payload is None:
+        payload = request.json
+
+    input_data = prepare_job_input(payload, get_servers_dict())
+    app.logger.info('get Hive %s', get_hive())
+    job = get_hive().create_job(app.analysis, input_data)
+    app.logger.info("Job created %s", job)
+    if request.is_json:
+        results = {"job_id": job.job_id}
+        return jsonify(results), 201
+    else:
+        return redirect(url_for('job_result', job_id=str(job.job_id)))
+
+
+@app.route('/jobs/batch', methods=['POST'])
+def job_submit_batch():
+    body = request.get_json(silent=True)
+    payloads = body.get('jobs') if isinstance(body, dict) else None
+    if not isinstance(payloads, list) or not payloads:
+        return jsonify({'error': 'jobs list needed'}), 400
+    if len(payloads) > DatacheckConfig.JOB_BATCH_MAX:
+        return jsonify({'error': f"At most {DatacheckConfig.JOB_BATCH_MAX} jobs per request"}), 400
+
+    servers = get_servers_dict()
+
+    def prepare(payload):
+        try:
+            return prepare_job_input(payload, servers), None
+        except KeyError as e:
+            return None, f"Missing or unknown parameter value {e}"
+        except Exception as e:
+            app.logger.warning('Invalid payload %s: %s', payload, e)
+            return None, str(e)
+
+    # Validation and db type lookups query the MySQL servers: run them concurrently
+    with ThreadPoolExecutor(max_workers=DatacheckConfig.JOB_BATCH_WORKERS) as executor:
+        prepared = list(executor.map(prepare, payloads))
+
+    results = [{'error': error} if error else None for input_data, error in prepared]
+    inputs = [input_data for input_data, error in prepared if not error]
+    if inputs:
+        job_ids = iter(create_jobs(get_hive(), app.analysis, inputs))
+        results = [result or {'job_id': next(job_ids)} for result in results]
+    app.logger.info("Jobs created %s", results)
+    status = 201 if inputs and len(inputs) == len(payloads) else 207 if inputs else 400
+    return jsonify({'jobs': results}), status
+
+
+def prepare_job_input(payload, servers):
+    """Validate a submission payload and derive the input data of its hive job"""
     # Most of the parameters that are in the payload can be pushed straight
     # through to the input_data for the hive submission. The parameter names
     # have been made to match up nicely. However, there are a few input
     # parameters that need to be derived from the payload ones.
-    if payload is None:
-        payload = request.json
-
     input_data = dict(payload)
     app.logger.info('Received payload %s', input_data)
     assert_mysql_uri(input_data['server_url'])
@@ -301,8 +535,6 @@ def job_submit(payload=None):
     # Hard-code this for the time being; need to handle memory usage better for unparallelised runs
     input_data['parallelize_datachecks'] = 1
 
-    servers = get_servers_dict()
-    app.logger.info('Servers %s', servers)
     server_name = servers[input_data['server_url']]['server_name']
     config_profile = servers[input_data['server_url']]['config_profile']
     if dbname is not None:
@@ -312,43 +544,56 @@ def job_submit(payload=None):
     input_data['registry_file'] = set_registry_file(server_name)
 
     input_data['config_file'] = set_config_file(config_profile)
-    app.logger.info('get Hive %s', get_hive())
-    job = get_hive().create_job(app.analysis, input_data)
-    app.logger.info("Job created %s", job)
-    if request.is_json:
-        results = {"job_id": job.job_id}
-        return jsonify(results), 201
-    else:
-        return redirect(url_for('job_result', job_id=str(job.job_id)))
+    return input_data
 
 
 @app.route('/jobs', methods=['GET'])
 def job_list():
-    if not app.index:
-        # Empty list DC
-        raise MissingIndexException
+    # Empty list DC
+    get_index()
 
     fmt = request.args.get('format', None)
     job_id = request.args.get('job_id', None)
 
     if request.is_json or fmt == 'json':
+        paginated = 'limit' in request.args
+        since = request.args.get('since', None)
+        cursor = None
         if job_id:
-            jobs = [get_hive().get_result_for_job_id(job_id, progress=True)]
+            jobs = [get_job_result(get_hive(), job_id, progress=True)]
+            total = 1
+        elif since:
+            try:
+                jobs, cursor = get_jobs_since(get_hive(), app.analysis, since)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
         else:
-            jobs = get_hive().get_all_results(app.analysis)
-            # Handle case where submission is marked as complete,
-        # but where output has not been created.
-        for job in jobs:
-            if 'output' not in job.keys() and job['status'] not in ['failed', 'complete']:
-                job['status'] = 'incomplete'
-            if 'output' in job.keys() and job['output']['failed_total'] > 0:
-                job['status'] = 'failed'
-
+            status = request.args.get('status', None)
+            if status and status not in statuses:
+                return jsonify({'error': f"Unknown status {status}, expected one of {', '.join(statuses)}"}), 400
+            total, jobs, cursor = get_jobs_page(get_hive(), app.analysis,
+                                                limit=request.args.get('limit', None, type=int),
+                                                offset=request.args.get('offset', 0, type=int),
+                                                sort=request.args.get('sort', None),
+                                                order=request.args.get('order', 'desc'),
+                                                search=request.args.get('search', None),
+                                                status=status)
+        if since:
+            return jsonify({'rows': jobs, 'cursor': cursor})
+        if paginated:
+            return jsonify({'total': total, 'rows': jobs, 'cursor': cursor})
         return jsonify(jobs)
 
     return render_template('list.html', job_id=job_id)
 
 
+def raw_json_response(content, mimetype='application/json', **kwargs):
+    """Response with already serialised JSON, only re-formatted when the request asks for pretty=1"""
+    if request.args.get('pretty', '0').lower() in ('1', 'true', 'yes'):
+        content = json.dumps(json.loads(content), indent=2).encode('utf-8')
+    return Response(content, mimetype=mimetype, **kwargs)
+
+
 @app.route('/jobs/details', methods=['GET'])
 def job_details():
     try:
@@ -362,29 +607,59 @@ def job_details():
                                         es_index=es_index,
                                         es_user=es_user,
                                         es_password=es_password,
-                                        es_ssl=es_ssl)
+                                        es_ssl=es_ssl,
+                                        raw=True)
             if not res['status']:
                 raise Exception(res['message'])
-            return jsonify(res['result'])
+            return raw_json_response(res['result'])
 
-        file_data = open(jsonfile, 'r').read()
-        return jsonify(json.loads(file_data))
+        with open(jsonfile, 'rb') as file_data:
+            return raw_json_response(file_data.read())
     except Exception as e:
         return jsonify({'error': f"Failed to retrieve the details : {str(e)}"}), 404
 
 
+@app.route('/jobs/details/batch', methods=['POST'])
+def job_details_batch():
+    jsonfiles = (request.get_json(silent=True) or {}).get('jsonfiles')
+    if not isinstance(jsonfiles, list) or not all(isinstance(jsonfile, str) for jsonfile in jsonfiles):
+        return jsonify({'error': 'Failed to retrieve the details : jsonfiles list needed '}), 400
+    if len(jsonfiles) > DatacheckConfig.DETAILS_BATCH_MAX:
+        return jsonify({'error': f"Failed to retrieve the details : "
+                                 f"at most {DatacheckConfig.DETAILS_BATCH_MAX} jsonfiles per request "}), 400
+
+    if app_es_data_source:
+        results = get_datacheck_results_batch(jsonfile_paths=jsonfiles,
+                                              es_host=es_host,
+                                              es_port=es_port,
+                                              es_index=es_index,
+                                              es_user=es_user,
+                                              es_password=es_password,
+                                              es_ssl=es_ssl)
+    else:
+        results = {}
+        for jsonfile in dict.fromkeys(jsonfiles):
+            try:
+                with open(jsonfile, 'rb') as file_data:
+                    results[jsonfile] = {'status': True, 'result': file_data.read()}
+            except Exception as e:
+                results[jsonfile] = {'status': False, 'message': str(e)}
+
+    # Results are already JSON: assemble the map around them rather than decoding them
+    details = []
+    for jsonfile, res in results.items():
+        if res['status']:
+            detail = res['result']
+        else:
+            detail = json.dumps({'error': f"Failed to retrieve the details : {res['message']}"}).encode('utf-8')
+        details.append(json.dumps(jsonfile).encode('utf-8') + b':' + detail)
+    return raw_json_response(b'{' + b','.join(details) + b'}')
+
+
 @app.route('/jobs/<int:job_id>', methods=['GET'])
 def job_result(job_id):
-    job = get_hive().get_result_for_job_id(job_id, progress=True)
+    job = get_job_result(get_hive(), job_id, progress=True)
     fmt = request.args.get('format', None)
-    # Handle case where submission is marked as complete,
-    # but where output has not been created.
-    if 'output' not in job.keys():
-        job['status'] = 'incomplete'
-    elif job['output']['failed_total'] > 0:
-        job['status'] = 'failed'
-    elif job['output']['passed_total'] == 0:
-        job['status'] = 'failed'
 
     if request.is_json or fmt == 'json':
         return jsonify(job)
@@ -393,10 +668,55 @@ def job_result(job_id):
         return render_template('list.html', job_id=job_id)
 
 
+def fetch_job_event(job_id):
+    try:
+        return get_job_result(get_hive(), job_id, progress=True)
+    except ValueError as e:
+        # Unknown job: nothing more to watch
+        return {'id': job_id, 'error': str(e)}
+
+
+job_watcher = JobWatcher(fetch_job_event, DatacheckConfig.SSE_POLL_INTERVAL)
+# Each stream holds a worker thread until it ends: only SSE_MAX_STREAMS of them are open at once, so that the
+# other threads are left to the other requests
+event_streams = threading.BoundedSemaphore(DatacheckConfig.SSE_MAX_STREAMS)
+
+
+def job_events_response(job_ids):
+    if not event_streams.acquire(blocking=False):
+        # Clients fall back to polling the job list, or retry once a stream has ended
+        return jsonify({'error': 'Too many event streams open, poll the jobs instead'}), 503, \
+            {'Retry-After': str(int(DatacheckConfig.SSE_MAX_DURATION))}
+    stream = job_event_stream(job_watcher, job_ids,
+                              is_terminal=lambda job: 'error' in job or job['status'] in terminal_statuses,
+                              max_duration=DatacheckConfig.SSE_MAX_DURATION)
+    response = Response(stream, mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Released once the response is closed, whether the stream was sent or not
+    response.call_on_close(event_streams.release)
+    return response
+
+
+@app.route('/jobs/<int:job_id>/events', methods=['GET'])
+def job_events(job_id):
+    return job_events_response([job_id])
+
+
+@app.route('/jobs/events', methods=['GET'])
+def jobs_events():
+    try:
+        job_ids = sorted({int(job_id) for value in request.args.getlist('job_id') for job_id in value.split(',')})
+    except ValueError:
+        return jsonify({'error': 'job_id must be a list of job ids'}), 400
+    if not job_ids or len(job_ids) > DatacheckConfig.SSE_MAX_JOBS:
+        return jsonify({'error': f"Between 1 and {DatacheckConfig.SSE_MAX_JOBS} job_id needed"}), 400
+    return job_events_response(job_ids)
+
+
 @app.route('/download_datacheck_outputs/<int:job_id>')
 def download_dc_outputs(job_id):
     try:
-        job = get_hive().get_result_for_job_id(job_id, progress=False)
+        job = get_job_result(get_hive(), job_id, progress=False)
         if 'output' in job:
 
             if app_es_data_source:
@@ -407,34 +727,28 @@ def download_dc_outputs(job_id):
                                             es_index=es_index,
                                             es_user=es_user,
                                             es_password=es_password,
-                                            es_ssl=es_ssl)
+                                            es_ssl=es_ssl,
+                                            raw=True)
                 if not res['status']:
                     raise Exception(res['message'])
 
-                buffer = BytesIO()
-                buffer.write(json.dumps(json.loads(res['result']), indent=2).encode('utf-8'))
-                buffer.seek(0)
-                return send_file(
-                    buffer,
-                    as_attachment=True,
-                    download_name='result_by_species.json',
-                    mimetype='text/json'
-                )
+                return raw_json_response(res['result'],
+                                         mimetype='text/json',
+                                         headers={'Content-Disposition': 'attachment; filename=result_by_species.json'})
             else:
                 base_path = Path(job['output']['output_dir'])
-                paths = list(base_path.iterdir())
+                paths = sorted(path for path in base_path.iterdir() if path.is_file())
                 if len(paths) > 1:
-                    data = BytesIO()
-                    with ZipFile(data, mode='w') as z:
-                        for f_path in paths:
-                            z.write(str(f_path), f_path.name)
-                    data.seek(0)
                     filename = 'Datacheck_output_job_%s.zip' % job_id
-                    return send_file(data, mimetype='application/zip',
-                                     attachment_filename=filename, as_attachment=True)
-                else:
-                    for f_path in paths:
-                        return send_file(str(f_path), as_attachment=True)
+                    return Response(stream_with_context(stream_zip(paths)),
+                                    mimetype='application/zip',
+                                    headers={'Content-Disposition': f'attachment; filename={filename}'},
+                                    direct_passthrough=True)
+                elif paths:
+                    # Conditional response: supports Range requests to resume an interrupted download
+                    return send_file(str(paths[0]), as_attachment=True, conditional=True)
+                raise Exception(f'No output found in {base_path}')
+        raise Exception('Job has no output')
 
     except Exception as e:
         return jsonify({'error': f"Failed to download the dc result : {str(e)}"}), 404
@@ -444,9 +758,8 @@ def download_dc_outputs(job_id):
 def display_form():
     # Here we convert the form fields into a 'payload' dictionary
     # that is the required input format for the hive submission.
-    if not app.index:
-        # Empty list DC
-        raise MissingIndexException
+    # Empty list DC
+    get_index()
 
     try:
 
@@ -511,19 +824,24 @@ def display_form():
     )
 
 
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify({name: cache.stats() for name, cache in caches.items()})
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    content, content_type = latest_metrics()
+    return app.response_class(content, content_type=content_type)
+
+
 @app.route('/ping', methods=['GET'])
 def ping():
     return jsonify({'status': 'ok'})
 
 
 def set_db_type(dbname, db_uri):
-    p = re.compile('cdna|otherfeatures|rnaseq')
-    m = p.search(dbname)
-    if m is not None:
-        db_type = m.group()
-    else:
-        db_type = get_db_type(qualified_name(db_uri))
-    return db_type
+    return resolve_db_type(dbname, db_uri)
 
 
 def set_registry_file(server_name):
@@ -534,9 +852,11 @@ def set_config_file(config_profile):
     return os.path.join(app.config['DATACHECK_CONFIG_DIR'], '.'.join([config_profile, 'json']))
 
 
+grch37_pattern = re.compile('homo_sapiens.*_37')
+
+
 def is_grch37(dbname):
-    p = re.compile('homo_sapiens.*_37')
-    return p.match(dbname)
+    return grch37_pattern.match(dbname)
 
 
 @app.errorhandler(HTTPRequestError)
@@ -556,6 +876,12 @@ def handle_server_error(e):
     return jsonify(error=str(e)), 500
 
 
+@app.errorhandler(SearchTimeoutException)
+def handle_search_timeout(e):
+    app.logger.warning(str(e))
+    return jsonify(error=str(e)), 400
+
+
 @app.errorhandler(ensembl.production.datacheck.exceptions.MissingIndexException)
 def handle_server_error(e):
     message = f"Missing Datacheck index configuration for {app.config['ENS_VERSION']} {e}"
@@ -0,0 +1,109 @@
+# See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+import threading
+import time
+from collections import OrderedDict
+
+from ensembl.production.datacheck.metrics import cache_evictions, cache_lookups
+
+# All the caches of the process, by name, for reporting
+caches = {}
+
+
+class LRUCache:
+    """Thread-safe in-process cache, evicting least recently used entries beyond a maximum total size
+
+    Args:
+        name (str): name the cache is reported under
+        max_size (int): maximum total size of the entries
+        sizeof (callable): size of a value, counting 1 per entry by default
+        ttl (float): default number of seconds an entry stays valid, None for no expiry
+    """
+
+    def __init__(self, name, max_size, sizeof=None, ttl=None):
+        self.name = name
+        self.max_size = max_size
+        self.sizeof = sizeof or (lambda value: 1)
+        self.ttl = ttl
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits_metric = cache_lookups.labels(name, 'hit')
+        self._misses_metric = cache_lookups.labels(name, 'miss')
+        self._evictions_metric = cache_evictions.labels(name)
+        caches[name] = self
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] is not None and entry[2] < time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                self._misses_metric.inc()
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self._hits_metric.inc()
+            return entry[0]
+
+    def set(self, key, value, ttl=None, size=None):
+        """Store a value, expiring after ttl seconds (the cache default if None)"""
+        size = self.sizeof(value) if size is None else size
+        ttl = self.ttl if ttl is None else ttl
+        expires = None if ttl is None else time.monotonic() + ttl
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_size:
+                return
+            self._entries[key] = (value, size, expires)
+            self.size += size
+            while self.size > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+                self._evictions_metric.inc()
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            return self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def _remove(self, key):
+        value, size, expires = self._entries.pop(key)
+        self.size -= size
+        return value
+
+    def stats(self):
+        requests = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'size': self.size,
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': self.hits / requests if requests else None,
+        }
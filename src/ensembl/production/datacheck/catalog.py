@@ -0,0 +1,144 @@
+# See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+import hashlib
+import json
+import logging
+import threading
+import time
+from typing import NamedTuple
+
+from ensembl.production.datacheck.index import DatacheckIndex
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogSnapshot(NamedTuple):
+    """
+    Datacheck index and server names as published to the endpoints. A snapshot is never modified once
+    published: a reload builds a new one, with the next version number, and replaces it as a whole.
+    """
+    version: int
+    index: DatacheckIndex
+    server_names: dict
+    servers_list: list
+    loaded_at: float
+    digest: str
+
+
+class Catalog:
+    """
+    Holder of the current CatalogSnapshot, which can be reloaded (on demand or on a fixed interval) without
+    restarting the worker. Reloads run outside of the request path, and requests read whichever snapshot
+    is current when they start.
+
+    Args:
+        datachecks (dict): initial datacheck index
+        server_names (dict): initial server names, keyed by server URL
+        index_loader (callable): returns an updated datacheck index, or None if it has not changed
+        servers_loader (callable): returns the current server names
+    """
+
+    def __init__(self, datachecks, server_names, index_loader=None, servers_loader=None):
+        self.index_loader = index_loader
+        self.servers_loader = servers_loader
+        self._reload_lock = threading.Lock()
+        self._reloader = None
+        self._poller = None
+        self.snapshot = self._build(1, DatacheckIndex(datachecks), server_names)
+
+    @staticmethod
+    def _build(version, index, server_names):
+        # Content hash, identical across workers serving the same index and server names
+        content = json.dumps([index.datachecks, server_names], sort_keys=True).encode('utf-8')
+        return CatalogSnapshot(version=version,
+                               index=index,
+                               server_names=server_names,
+                               servers_list=sorted(set(server_names)),
+                               loaded_at=time.time(),
+                               digest=hashlib.sha1(content).hexdigest())
+
+    def publish(self, index=None, server_names=None):
+        """Replace the current snapshot, keeping the current index or server names where none is given"""
+        current = self.snapshot
+        self.snapshot = self._build(current.version + 1,
+                                    current.index if index is None else index,
+                                    current.server_names if server_names is None else server_names)
+        logger.info("Published catalog version %s", self.snapshot.version)
+        return self.snapshot
+
+    def reload(self, index=True, servers=True):
+        """
+        Reload the datacheck index and/or server names, publishing a new snapshot only if either changed.
+        A loader that fails leaves its part of the catalog as it was.
+        """
+        with self._reload_lock:
+            current = self.snapshot
+            new_index = None
+            if index and self.index_loader is not None:
+                datachecks = self._load(self.index_loader, 'datacheck index')
+                if datachecks and datachecks != current.index.datachecks:
+                    new_index = DatacheckIndex(datachecks)
+            server_names = None
+            if servers and self.servers_loader is not None:
+                server_names = self._load(self.servers_loader, 'server names')
+                if not server_names or server_names == current.server_names:
+                    server_names = None
+            if new_index is None and server_names is None:
+                return current
+            return self.publish(new_index, server_names)
+
+    @staticmethod
+    def _load(loader, description):
+        try:
+            return loader()
+        except Exception as e:
+            logger.warning("Unable to reload %s: %s", description, e)
+            return None
+
+    def reload_in_background(self, index=True, servers=True):
+        """Reload in a daemon thread, unless a background reload is already running: returns its thread"""
+        if self._reloader is not None and self._reloader.is_alive():
+            return self._reloader
+        self._reloader = threading.Thread(target=self.reload, args=(index, servers), name='datacheck-catalog-reload',
+                                          daemon=True)
+        self._reloader.start()
+        return self._reloader
+
+    def after_fork(self):
+        """
+        Reset the lock and threads of a catalog inherited from a parent process. A reload running in the parent
+        when it forked holds a lock that would never be released in the child: reload again in the child instead.
+        """
+        interrupted = self._reload_lock.locked()
+        self._reload_lock = threading.Lock()
+        self._reloader = None
+        self._poller = None
+        if interrupted:
+            self.reload_in_background()
+
+    def start_polling(self, interval):
+        """Reload every interval seconds, in a daemon thread"""
+        if self._poller is not None and self._poller.is_alive():
+            return self._poller
+
+        def poll():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.reload()
+                except Exception:
+                    # e.g. a malformed index: keep the current snapshot and try again at the next interval
+                    logger.exception("Unable to reload the catalog")
+
+        self._poller = threading.Thread(target=poll, name='datacheck-catalog-poller', daemon=True)
+        self._poller.start()
+        return self._poller
@@ -15,6 +15,7 @@ import logging
 import os
 import pathlib
 import requests.exceptions
+import tempfile
 import urllib
 from pathlib import Path
 
@@ -56,15 +57,95 @@ def get_server_names(url, flag=0):
 
 class DCConfigLoader:
     base_uri = 'https://raw.githubusercontent.com/Ensembl/ensembl-datacheck/'
+    index_path = 'lib/Bio/EnsEMBL/DataCheck/index.json'
+    timeout = 10
 
     @classmethod
     def load_config(cls, version):
-        loader = RemoteFileLoader('json')
+        """Download the index for a release, without caching it (see fetch)"""
+        return cls.fetch(version)['index']
+
+    @classmethod
+    def load_cached_config(cls, version, cache_dir):
+        """
+        Return the index for a release from the on-disk cache, downloading (and caching) it only if there is
+        no cached copy yet. Use refresh() to revalidate a cached copy.
+        """
+        cached = cls.read_cache(version, cache_dir)
+        if cached is not None:
+            return cached['index']
+        entry = cls.fetch(version)
+        try:
+            cls.write_cache(version, cache_dir, entry)
+        except OSError as e:
+            logger.warning(f"Unable to cache index.json for {version} in {cache_dir}: {e}")
+        return entry['index']
+
+    @classmethod
+    def refresh(cls, version, cache_dir):
+        """Revalidate the cached index for a release, returning the new index if it changed, None otherwise"""
+        cached = cls.read_cache(version, cache_dir)
+        entry = cls.fetch(version, cached)
+        if entry is None:
+            return None
+        cls.write_cache(version, cache_dir, entry)
+        if cached is not None and cached['index'] == entry['index']:
+            return None
+        return entry['index']
+
+    @classmethod
+    def fetch(cls, version, cached=None):
+        """
+        Download index.json for a release, falling back to main if the release branch does not exist yet.
+        If a cached entry is given, the request is conditional on its ETag / Last-Modified, and None is
+        returned when the index has not changed.
+        """
+        release_url = f'{cls.base_uri}release/{version}/{cls.index_path}'
+        main_url = f'{cls.base_uri}main/{cls.index_path}'
+        for url in (release_url, main_url):
+            headers = {}
+            if cached is not None and cached.get('url') == url:
+                if cached.get('etag'):
+                    headers['If-None-Match'] = cached['etag']
+                if cached.get('last_modified'):
+                    headers['If-Modified-Since'] = cached['last_modified']
+            try:
+                response = requests.get(url, headers=headers, timeout=cls.timeout)
+                response.raise_for_status()
+            except requests.exceptions.HTTPError as e:
+                if url == main_url:
+                    raise
+                logger.warning(f"Loading /{version}/ index.json from main")
+                continue
+            if response.status_code == 304:
+                return None
+            return {
+                'url': url,
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'index': response.json()
+            }
+
+    @classmethod
+    def cache_file(cls, version, cache_dir):
+        return Path(cache_dir) / f'index_{version}.json'
+
+    @classmethod
+    def read_cache(cls, version, cache_dir):
         try:
-            return loader.r_open(f'{cls.base_uri}release/{version}/lib/Bio/EnsEMBL/DataCheck/index.json')
-        except requests.exceptions.HTTPError as e:
-            logger.warning(f"Loading /{version}/ index.json from main")
-            return loader.r_open(f'{cls.base_uri}main/lib/Bio/EnsEMBL/DataCheck/index.json')
+            with open(cls.cache_file(version, cache_dir)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @classmethod
+    def write_cache(cls, version, cache_dir, entry):
+        # Write to a temporary file and rename it, so that concurrent workers never read a partial file
+        path = cls.cache_file(version, cache_dir)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile('w', dir=path.parent, prefix=f'.{path.name}', delete=False) as f:
+            json.dump(entry, f)
+        os.replace(f.name, path)
 
 
 class EnsemblConfig:
@@ -89,7 +170,10 @@ class EnsemblConfig:
 
 
 class DatacheckConfig(EnsemblConfig):
-    DATACHECK_INDEX = DCConfigLoader.load_config(EnsemblConfig.ENS_VERSION)
+    DATACHECK_INDEX_CACHE_DIR = os.path.expanduser(
+        os.environ.get("DATACHECK_INDEX_CACHE_DIR",
+                       EnsemblConfig.file_config.get('datacheck_index_cache_dir', '~/.cache/datacheck')))
+    DATACHECK_INDEX = DCConfigLoader.load_cached_config(EnsemblConfig.ENS_VERSION, DATACHECK_INDEX_CACHE_DIR)
 
     DATACHECK_COMMON_DIR = os.environ.get("DATACHECK_COMMON_DIR",
                                           EnsemblConfig.file_config.get('datacheck_common_dir', '~/datachecks'))
@@ -98,6 +182,19 @@ class DatacheckConfig(EnsemblConfig):
     HIVE_ANALYSIS = os.environ.get("HIVE_ANALYSIS",
                                    EnsemblConfig.file_config.get('hive_analysis', 'DataCheckSubmission'))
     HIVE_URI = os.environ.get("HIVE_URI", EnsemblConfig.file_config.get('hive_uri'))
+    # Read-only replica of the hive database for the job list and results, HIVE_URI if not set
+    HIVE_READ_URI = os.environ.get("HIVE_READ_URI", EnsemblConfig.file_config.get('hive_read_uri'))
+    # Connection pool of each worker: persistent connections, extra connections under load, seconds to wait for
+    # a connection, seconds after which connections are recycled, and liveness check before reusing a connection
+    HIVE_POOL_SIZE = int(os.environ.get('HIVE_POOL_SIZE', EnsemblConfig.file_config.get('hive_pool_size', 5)))
+    HIVE_MAX_OVERFLOW = int(os.environ.get('HIVE_MAX_OVERFLOW', EnsemblConfig.file_config.get('hive_max_overflow', 10)))
+    HIVE_POOL_TIMEOUT = float(os.environ.get('HIVE_POOL_TIMEOUT', EnsemblConfig.file_config.get('hive_pool_timeout', 30)))
+    HIVE_POOL_RECYCLE = int(os.environ.get('HIVE_POOL_RECYCLE', EnsemblConfig.file_config.get('hive_pool_recycle', 3600)))
+    HIVE_POOL_PRE_PING = str(os.environ.get('HIVE_POOL_PRE_PING', EnsemblConfig.file_config.get('hive_pool_pre_ping',
+                                                                                              'true'))).lower() in ['true', '1']
+    # Hive queries slower than this many seconds are logged as warnings; all are logged at debug level
+    HIVE_SLOW_QUERY_TIME = float(os.environ.get('HIVE_SLOW_QUERY_TIME',
+                                                EnsemblConfig.file_config.get('hive_slow_query_time', 0.5)))
     SERVER_NAMES_FILE = os.environ.get("SERVER_NAMES", EnsemblConfig.file_config.get('server_names_file',
                                                                                      os.path.join(
                                                                                          os.path.dirname(__file__),
@@ -109,6 +206,21 @@ class DatacheckConfig(EnsemblConfig):
     COPY_URI_DROPDOWN = os.environ.get("COPY_URI_DROPDOWN",
                                        EnsemblConfig.file_config.get('copy_uri_dropdown',
                                                                      "http://localhost:80/"))
+    # dbcopy database lists: connect and read timeouts in seconds, seconds and number of responses cached,
+    # and connections kept alive per process
+    COPY_TIMEOUT = (float(os.environ.get('COPY_CONNECT_TIMEOUT',
+                                         EnsemblConfig.file_config.get('copy_connect_timeout', 2))),
+                    float(os.environ.get('COPY_READ_TIMEOUT',
+                                         EnsemblConfig.file_config.get('copy_read_timeout', 10))))
+    COPY_CACHE_TTL = float(os.environ.get('COPY_CACHE_TTL', EnsemblConfig.file_config.get('copy_cache_ttl', 60)))
+    COPY_CACHE_SIZE = int(os.environ.get('COPY_CACHE_SIZE', EnsemblConfig.file_config.get('copy_cache_size', 1000)))
+    COPY_POOL_MAXSIZE = int(os.environ.get('COPY_POOL_MAXSIZE',
+                                           EnsemblConfig.file_config.get('copy_pool_maxsize', 10)))
+
+    SEARCH_RESULT_LIMIT = int(os.environ.get('SEARCH_RESULT_LIMIT',
+                                             EnsemblConfig.file_config.get('search_result_limit', 50)))
+    SEARCH_REGEX_TIMEOUT = float(os.environ.get('SEARCH_REGEX_TIMEOUT',
+                                                EnsemblConfig.file_config.get('search_regex_timeout', 1.0)))
 
     DATACHECK_TYPE = os.environ.get('DATACHECK_TYPE', EnsemblConfig.file_config.get('datacheck_type', 'vertebrates'))
 
@@ -120,9 +232,78 @@ class DatacheckConfig(EnsemblConfig):
     ES_PORT = os.environ.get('ES_PORT', EnsemblConfig.file_config.get('es_port', '9200'))
     ES_SSL = os.environ.get('ES_SSL', EnsemblConfig.file_config.get('es_ssl', "f")).lower() in ['true', '1']
     ES_INDEX = os.environ.get('ES_INDEX', EnsemblConfig.file_config.get('es_index', "datacheck_results"))
+    ES_TIMEOUT = float(os.environ.get('ES_TIMEOUT', EnsemblConfig.file_config.get('es_timeout', 10)))
+    ES_MAX_RETRIES = int(os.environ.get('ES_MAX_RETRIES', EnsemblConfig.file_config.get('es_max_retries', 2)))
+    ES_POOL_MAXSIZE = int(os.environ.get('ES_POOL_MAXSIZE', EnsemblConfig.file_config.get('es_pool_maxsize', 10)))
+    # Per-process cache of datacheck results: maximum size in bytes, and seconds before checking for newer reports
+    ES_RESULTS_CACHE_SIZE = int(os.environ.get('ES_RESULTS_CACHE_SIZE',
+                                               EnsemblConfig.file_config.get('es_results_cache_size', 64 * 2 ** 20)))
+    ES_RESULTS_CACHE_REVALIDATE = float(os.environ.get('ES_RESULTS_CACHE_REVALIDATE',
+                                                       EnsemblConfig.file_config.get('es_results_cache_revalidate',
+                                                                                     30)))
+    # Bytes read at a time when streaming datacheck outputs
+    DOWNLOAD_CHUNK_SIZE = int(os.environ.get('DOWNLOAD_CHUNK_SIZE',
+                                             EnsemblConfig.file_config.get('download_chunk_size', 2 ** 16)))
+    # Per-process cache of database types read from the meta table, in number of databases
+    DB_TYPES_CACHE_SIZE = int(os.environ.get('DB_TYPES_CACHE_SIZE',
+                                             EnsemblConfig.file_config.get('db_types_cache_size', 10000)))
+    # Requests with a profile query parameter or X-Profile header (equal to PROFILING_TOKEN if set) are profiled,
+    # as pstats or collapsed stacks, in PROFILING_DIR
+    PROFILING_ENABLED = str(os.environ.get('PROFILING_ENABLED',
+                                           EnsemblConfig.file_config.get('profiling_enabled', 'false'))).lower() in ['true', '1']
+    PROFILING_TOKEN = os.environ.get('PROFILING_TOKEN', EnsemblConfig.file_config.get('profiling_token', ''))
+    PROFILING_DIR = os.path.expanduser(
+        os.environ.get('PROFILING_DIR', EnsemblConfig.file_config.get('profiling_dir', '~/.cache/datacheck/profiles')))
+    PROFILING_FORMAT = os.environ.get('PROFILING_FORMAT', EnsemblConfig.file_config.get('profiling_format', 'pstats'))
+    # Seconds a new worker spends at most opening its connections before serving requests, and number of jobs of
+    # the job list it caches
+    WORKER_WARMUP_TIMEOUT = float(os.environ.get('WORKER_WARMUP_TIMEOUT',
+                                                 EnsemblConfig.file_config.get('worker_warmup_timeout', 5)))
+    WORKER_WARMUP_JOBS = int(os.environ.get('WORKER_WARMUP_JOBS',
+                                            EnsemblConfig.file_config.get('worker_warmup_jobs', 25)))
+    # Per-process cache of job results: maximum size in bytes, and seconds jobs not yet complete or failed are kept
+    JOB_RESULTS_CACHE_SIZE = int(os.environ.get('JOB_RESULTS_CACHE_SIZE',
+                                                EnsemblConfig.file_config.get('job_results_cache_size', 16 * 2 ** 20)))
+    JOB_RESULTS_CACHE_TTL = float(os.environ.get('JOB_RESULTS_CACHE_TTL',
+                                                 EnsemblConfig.file_config.get('job_results_cache_ttl', 5)))
+    # Maximum number of incomplete jobs (the most recent ones) whose changes the job list cursor tracks: older
+    # ones are only refreshed when the list is reloaded, keeping the cursor within a request line
+    JOBS_CURSOR_MAX_PENDING = int(os.environ.get('JOBS_CURSOR_MAX_PENDING',
+                                                 EnsemblConfig.file_config.get('jobs_cursor_max_pending', 100)))
+    # Job progress events: seconds between two polls of the hive, longest stream (kept under the worker
+    # timeout) after which browsers reconnect, maximum number of jobs per stream, and maximum number of streams
+    # open at once per worker, each holding one of its threads (see gunicorn_config.py)
+    SSE_POLL_INTERVAL = float(os.environ.get('SSE_POLL_INTERVAL',
+                                             EnsemblConfig.file_config.get('sse_poll_interval', 5)))
+    SSE_MAX_DURATION = float(os.environ.get('SSE_MAX_DURATION',
+                                            EnsemblConfig.file_config.get('sse_max_duration', 25)))
+    SSE_MAX_JOBS = int(os.environ.get('SSE_MAX_JOBS', EnsemblConfig.file_config.get('sse_max_jobs', 100)))
+    SSE_MAX_STREAMS = int(os.environ.get('SSE_MAX_STREAMS', EnsemblConfig.file_config.get('sse_max_streams', 4)))
+    # Seconds before the database list of a server is refreshed in the background, and after which it is no
+    # longer served while being refreshed
+    DATABASES_CACHE_TTL = float(os.environ.get('DATABASES_CACHE_TTL',
+                                               EnsemblConfig.file_config.get('databases_cache_ttl', 300)))
+    DATABASES_CACHE_MAX_STALE = float(os.environ.get('DATABASES_CACHE_MAX_STALE',
+                                                     EnsemblConfig.file_config.get('databases_cache_max_stale', 3600)))
+    # Maximum number of jobs per /jobs/batch request, and number of them validated concurrently
+    JOB_BATCH_MAX = int(os.environ.get('JOB_BATCH_MAX', EnsemblConfig.file_config.get('job_batch_max', 100)))
+    JOB_BATCH_WORKERS = int(os.environ.get('JOB_BATCH_WORKERS', EnsemblConfig.file_config.get('job_batch_workers', 8)))
+    # Maximum number of result files per /jobs/details/batch request
+    DETAILS_BATCH_MAX = int(os.environ.get('DETAILS_BATCH_MAX', EnsemblConfig.file_config.get('details_batch_max', 500)))
 
-    GET_SERVER_NAMES = os.environ.get('GET_SERVER_NAMES', EnsemblConfig.file_config.get('get_server_names', 0))
+    # Fetch the server names from dbcopy rather than reading them from the SERVER_NAMES file
+    GET_SERVER_NAMES = str(os.environ.get('GET_SERVER_NAMES',
+                                          EnsemblConfig.file_config.get('get_server_names', 0))).lower() in ['true', '1']
 
     SERVER_NAMES = get_server_names(COPY_URI_DROPDOWN, GET_SERVER_NAMES)
+    # Seconds between reloads of the datacheck index and server names, 0 to only reload on demand
+    CATALOG_RELOAD_INTERVAL = int(os.environ.get('CATALOG_RELOAD_INTERVAL',
+                                                 EnsemblConfig.file_config.get('catalog_reload_interval', 0)))
+    # Token to send in the X-Reload-Token header of POST /catalog/reload, which is disabled if none is set
+    CATALOG_RELOAD_TOKEN = os.environ.get('CATALOG_RELOAD_TOKEN',
+                                          EnsemblConfig.file_config.get('catalog_reload_token', ''))
+    # Seconds browsers and proxies may reuse catalog responses before revalidating them
+    CATALOG_CACHE_MAX_AGE = int(os.environ.get('CATALOG_CACHE_MAX_AGE',
+                                               EnsemblConfig.file_config.get('catalog_cache_max_age', 60)))
 
     APP_VERSION = get_app_version()
@@ -0,0 +1,127 @@
+# See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+import bisect
+import itertools
+import logging
+import threading
+import time
+
+from ensembl.production.datacheck.cache import LRUCache
+from ensembl.production.datacheck.search import regex_filter
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseCatalogue:
+    """
+    Database names of a server, sorted for prefix lookups
+
+    Args:
+        names (list): database names
+    """
+
+    def __init__(self, names):
+        self.names = sorted(names)
+        self.loaded_at = time.monotonic()
+        # Lower case names, for case-insensitive prefixes
+        self._keys = sorted((name.lower(), name) for name in self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def age(self):
+        return time.monotonic() - self.loaded_at
+
+    def prefix(self, prefix, limit=None):
+        """Names starting with prefix, whatever their case"""
+        prefix = prefix.lower()
+        start = bisect.bisect_left(self._keys, (prefix,))
+        names = (name for key, name in itertools.islice(self._keys, start, None))
+        matches = itertools.takewhile(lambda name: name.lower().startswith(prefix), names)
+        return list(itertools.islice(matches, limit))
+
+    def search(self, query=None, limit=None, timeout=1.0):
+        """
+        Names matching the regular expression anywhere, like MySQL's RLIKE, or all names if query is None. The
+        match is bounded to timeout seconds, see regex_filter.
+        """
+        if query is None:
+            return self.names[:limit]
+        return regex_filter(self.names, query, timeout, limit)
+
+
+class DatabaseCatalogues:
+    """
+    Database catalogues of the servers, loaded on first use and then served from memory. A catalogue older than
+    ttl seconds is still served, while it is reloaded in the background (stale-while-revalidate); one older than
+    max_stale seconds is reloaded before being served. Concurrent requests for a server trigger a single load.
+
+    Args:
+        loader (callable): returns the database names of a server URI
+        ttl (float): seconds before a catalogue is reloaded
+        max_stale (float): seconds after which a catalogue is no longer served
+        max_servers (int): maximum number of catalogues kept
+    """
+
+    def __init__(self, loader, ttl, max_stale, max_servers=100):
+        self.loader = loader
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.cache = LRUCache('databases', max_servers)
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def get(self, server_uri):
+        catalogue = self.cache.get(server_uri)
+        if catalogue is None or catalogue.age() > self.max_stale:
+            return self.load(server_uri)
+        if catalogue.age() > self.ttl and not self.loading(server_uri):
+            threading.Thread(target=self._reload, args=(server_uri,), name='datacheck-databases-reload',
+                             daemon=True).start()
+        return catalogue
+
+    def loading(self, server_uri):
+        with self._lock:
+            return server_uri in self._loading
+
+    def load(self, server_uri):
+        """Load the catalogue of a server, waiting for the load already in progress if there is one"""
+        with self._lock:
+            loading = self._loading.get(server_uri)
+            if loading is None:
+                loading = self._loading[server_uri] = threading.Lock()
+                loading.acquire()
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            with loading:
+                pass
+            catalogue = self.cache.get(server_uri)
+            if catalogue is not None:
+                return catalogue
+            # The load in progress failed: try again
+            return self.load(server_uri)
+        try:
+            catalogue = DatabaseCatalogue(self.loader(server_uri))
+            self.cache.set(server_uri, catalogue)
+            return catalogue
+        finally:
+            with self._lock:
+                del self._loading[server_uri]
+            loading.release()
+
+    def _reload(self, server_uri):
+        try:
+            self.load(server_uri)
+        except Exception as e:
+            logger.warning("Unable to reload the databases of %s: %s", server_uri, e)
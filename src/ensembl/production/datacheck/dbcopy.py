@@ -0,0 +1,153 @@
+# See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ensembl.production.datacheck.cache import LRUCache
+from ensembl.production.datacheck.metrics import observe_backend
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyStats:
+    """Number, errors and durations of calls to a backend, with percentiles over the most recent ones
+
+    Args:
+        window (int): number of recent durations kept for percentiles
+    """
+
+    def __init__(self, window=1000):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, duration, error=False):
+        with self._lock:
+            self.count += 1
+            self.errors += int(error)
+            self.total += duration
+            self.max = max(self.max, duration)
+            self._recent.append(duration)
+
+    def stats(self):
+        with self._lock:
+            recent = sorted(self._recent)
+
+        def percentile(p):
+            return recent[min(len(recent) - 1, int(p * len(recent)))] if recent else None
+
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'mean': self.total / self.count if self.count else None,
+            'max': self.max if self.count else None,
+            'p50': percentile(0.5),
+            'p95': percentile(0.95),
+            'p99': percentile(0.99),
+        }
+
+
+class DbCopyClient:
+    """
+    Client of the dbcopy service listing the databases of a server. Responses are cached for ttl seconds, and
+    concurrent identical requests share a single call to the service. Connections are kept alive in a pool of
+    pool_maxsize per process.
+
+    Args:
+        base_uri (str): dbcopy service root, e.g. http://localhost:80/
+        timeout (tuple): connect and read timeouts in seconds
+        ttl (float): seconds a response is cached
+        max_entries (int): maximum number of responses cached
+        pool_maxsize (int): maximum number of connections kept alive
+    """
+
+    def __init__(self, base_uri, timeout, ttl, max_entries, pool_maxsize=10):
+        self.base_uri = base_uri
+        self.timeout = timeout
+        self.pool_maxsize = pool_maxsize
+        self.cache = LRUCache('dbcopy_databases', max_entries, ttl=ttl)
+        self.latency = LatencyStats()
+        self._session = None
+        self._session_pid = None
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        """Session of this process: a forked process does not reuse the sockets of its parent"""
+        with self._lock:
+            if self._session is None or self._session_pid != os.getpid():
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._session = session
+                self._session_pid = os.getpid()
+            return self._session
+
+    def databases(self, host, port, search):
+        """
+        Names of the databases of host:port matching search, as listed by the dbcopy service
+
+        Raises:
+            requests.exceptions.RequestException: the service is unreachable, too slow or returned an error
+        """
+        key = (host, str(port), search)
+        databases = self.cache.get(key)
+        if databases is not None:
+            return databases
+        with self._lock:
+            pending = self._pending.get(key)
+            owner = pending is None
+            if owner:
+                pending = self._pending[key] = Future()
+        if not owner:
+            return pending.result()
+        try:
+            databases = self._fetch(host, port, search)
+            self.cache.set(key, databases)
+            pending.set_result(databases)
+            return databases
+        except Exception as e:
+            pending.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._pending[key]
+
+    def _fetch(self, host, port, search):
+        url = f"{self.base_uri}api/dbcopy/databases/{host}/{port}"
+        start = time.perf_counter()
+        try:
+            response = self.session.get(url, params={'search': search}, timeout=self.timeout)
+            response.raise_for_status()
+            databases = response.json()
+        except Exception:
+            elapsed = time.perf_counter() - start
+            self.latency.observe(elapsed, error=True)
+            observe_backend('dbcopy', 'databases', elapsed, error=True)
+            raise
+        elapsed = time.perf_counter() - start
+        self.latency.observe(elapsed)
+        observe_backend('dbcopy', 'databases', elapsed)
+        logger.debug("dbcopy databases of %s:%s matching %s in %.3fs", host, port, search, elapsed)
+        return databases
@@ -0,0 +1,148 @@
+# See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """Job updates for one client, as (job_id, job) tuples in a queue"""
+
+    def __init__(self, job_ids):
+        self.job_ids = frozenset(job_ids)
+        self.updates = queue.Queue()
+
+    def get(self, timeout=None):
+        """Next (job_id, job) update, raising queue.Empty if there is none within timeout seconds"""
+        return self.updates.get(timeout=timeout)
+
+
+class JobWatcher:
+    """
+    Single poller of the jobs watched by the clients of the process. Each watched job is fetched once per
+    interval, whatever the number of clients watching it, and only changes are sent to its subscribers.
+    The poller thread only runs while there are subscribers.
+
+    Args:
+        fetch (callable): returns the current state of a job given its id
+        interval (float): seconds between two polls
+    """
+
+    def __init__(self, fetch, interval):
+        self.fetch = fetch
+        self.interval = interval
+        self._subscriptions = set()
+        self._latest = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def subscribe(self, job_ids):
+        """Subscription to the given jobs, receiving their current state first and then every change"""
+        subscription = Subscription(job_ids)
+        with self._lock:
+            self._subscriptions.add(subscription)
+            for job_id in subscription.job_ids:
+                if job_id in self._latest:
+                    subscription.updates.put((job_id, self._latest[job_id]))
+            if not subscription.job_ids.issubset(self._latest):
+                # Jobs not polled yet: fetch them now rather than at the next interval
+                self._wake.set()
+            if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='datacheck-job-watcher', daemon=True)
+                self._thread.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+            watched = self._watched()
+            for job_id in list(self._latest):
+                if job_id not in watched:
+                    del self._latest[job_id]
+
+    def _watched(self):
+        return set().union(*(subscription.job_ids for subscription in self._subscriptions))
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._subscriptions:
+                    self._thread = None
+                    return
+                watched = self._watched()
+            self.poll(watched)
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def poll(self, job_ids):
+        """Fetch the given jobs once, and send those that changed to their subscribers"""
+        for job_id in sorted(job_ids):
+            try:
+                job = self.fetch(job_id)
+            except Exception as e:
+                # Subscribers keep the last state sent until the next poll
+                logger.warning("Unable to fetch job %s: %s", job_id, e)
+                continue
+            with self._lock:
+                if self._latest.get(job_id) == job:
+                    continue
+                self._latest[job_id] = job
+                for subscription in self._subscriptions:
+                    if job_id in subscription.job_ids:
+                        subscription.updates.put((job_id, job))
+
+
+def job_event_stream(watcher, job_ids, is_terminal, max_duration, heartbeat=15, retry=5000):
+    """
+    Server-Sent Events of the jobs, ending once they all are in a terminal state. The stream is also closed
+    after max_duration seconds, so that a (sync) worker is not held indefinitely: the browser then reconnects
+    after retry milliseconds.
+
+    Args:
+        watcher (JobWatcher): poller of the jobs
+        job_ids (list): jobs to watch
+        is_terminal (callable): whether a job will not change any more
+        max_duration (float): seconds after which the stream is closed
+        heartbeat (float): seconds without update after which a comment is sent to keep the connection open
+        retry (int): milliseconds the browser waits before reconnecting
+
+    Yields:
+        str: events, 'job' with the job as data, and a final 'end'
+    """
+    subscription = watcher.subscribe(job_ids)
+    try:
+        yield f'retry: {retry}\n\n'
+        pending = set(job_ids)
+        deadline = time.monotonic() + max_duration
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                job_id, job = subscription.get(timeout=min(heartbeat, remaining))
+            except queue.Empty:
+                yield ': keepalive\n\n'
+                continue
+            yield f'event: job\nid: {job_id}\ndata: {json.dumps(job)}\n\n'
+            if is_terminal(job):
+                pending.discard(job_id)
+        yield 'event: end\ndata: {}\n\n'
+    finally:
+        watcher.unsubscribe(subscription)
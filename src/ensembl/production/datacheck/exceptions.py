@@ -13,3 +13,7 @@
 
 class MissingIndexException(IOError):
     pass
+
+
+class SearchTimeoutException(TimeoutError):
+    pass
@@ -0,0 +1,389 @@
+# See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+import base64
+import binascii
+import json
+import logging
+import os
+import threading
+import time
+from typing import NamedTuple
+
+from ensembl.production.core.models.hive import Analysis, AnalysisData, HiveInstance, Job, Result, Session
+from ensembl.production.core.perl_utils import dict_to_perl_string
+from sqlalchemy import String, and_, case, cast, create_engine, event, func, literal, or_, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import aliased, sessionmaker
+
+from ensembl.production.datacheck.cache import LRUCache
+from ensembl.production.datacheck.config import DatacheckConfig as dcg
+from ensembl.production.datacheck.metrics import observe_backend
+
+logger = logging.getLogger(__name__)
+
+# Sessions on the read replica of the hive database (or the hive database itself if there is none)
+ReadSession = sessionmaker()
+
+_hive = None
+_hive_pid = None
+_hive_lock = threading.Lock()
+
+statuses = ('complete', 'failed', 'incomplete')
+terminal_statuses = ('complete', 'failed')
+
+# Levels of descendants of a job searched for failed jobs by job_status
+job_tree_depth = 4
+
+# Job results with their normalised status, by job id and whether they include progress. Jobs in a terminal
+# status with an output never change and are kept until evicted, others only for JOB_RESULTS_CACHE_TTL seconds.
+job_results_cache = LRUCache('job_results', dcg.JOB_RESULTS_CACHE_SIZE, sizeof=lambda job: len(json.dumps(job)))
+
+
+class JobsPage(NamedTuple):
+    total: int
+    rows: list
+    cursor: str
+
+
+class JobsDelta(NamedTuple):
+    rows: list
+    cursor: str
+
+
+class PooledHiveInstance(HiveInstance):
+    """
+    HiveInstance with a tuned connection pool, an optional read replica for ReadSession, and timing of every query
+
+    Args:
+        url (str): hive database, bound to Session
+        read_url (str): read replica of the hive database, bound to ReadSession; url if None
+    """
+
+    def __init__(self, url, read_url=None):
+        self.engine = self.create_engine(url, 'hive')
+        Session.configure(bind=self.engine)
+        self.read_engine = self.create_engine(read_url, 'hive replica') if read_url else self.engine
+        ReadSession.configure(bind=self.read_engine)
+
+    @staticmethod
+    def create_engine(url, name):
+        if make_url(url).get_backend_name() == 'sqlite':
+            # No connection pool to tune
+            engine = create_engine(url)
+        else:
+            engine = create_engine(url,
+                                   pool_size=dcg.HIVE_POOL_SIZE,
+                                   max_overflow=dcg.HIVE_MAX_OVERFLOW,
+                                   pool_timeout=dcg.HIVE_POOL_TIMEOUT,
+                                   pool_recycle=dcg.HIVE_POOL_RECYCLE,
+                                   pool_pre_ping=dcg.HIVE_POOL_PRE_PING)
+        log_query_times(engine, name)
+        return engine
+
+    def read_session(self):
+        return ReadSession()
+
+    def dispose(self):
+        """Drop the connections inherited from a parent process, leaving them open for the parent"""
+        for engine in {self.engine, self.read_engine}:
+            engine.dispose(close=False)
+
+
+def log_query_times(engine, name):
+    """Log the time taken by each query of the engine: debug level, or warning beyond HIVE_SLOW_QUERY_TIME"""
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_start_time'].pop()
+        observe_backend(name, statement_type(statement), elapsed)
+        level = logging.WARNING if elapsed >= dcg.HIVE_SLOW_QUERY_TIME else logging.DEBUG
+        if logger.isEnabledFor(level):
+            logger.log(level, "%s query in %.1f ms: %s", name, elapsed * 1000, ' '.join(statement.split())[:500])
+
+    @event.listens_for(engine, 'handle_error')
+    def handle_error(context):
+        start_times = context.connection.info.get('query_start_time') if context.connection is not None else None
+        if start_times and context.statement is not None:
+            observe_backend(name, statement_type(context.statement), time.perf_counter() - start_times.pop(),
+                            error=True)
+
+
+def statement_type(statement):
+    """First keyword of a SQL statement (select, insert...), to label its metrics"""
+    words = statement.split(None, 1)
+    return words[0].lower() if words else 'unknown'
+
+
+def get_hive_instance(url, read_url=None):
+    """
+    Hive database of this process, created on first use. A process forked after it was created (e.g. a gunicorn
+    worker of a preloaded app) gets its own instance and connection pool rather than sharing the parent's.
+    """
+    global _hive, _hive_pid
+    with _hive_lock:
+        if _hive is not None and _hive_pid != os.getpid():
+            _hive.dispose()
+            _hive = None
+        if _hive is None:
+            _hive = PooledHiveInstance(url, read_url)
+            _hive_pid = os.getpid()
+        return _hive
+
+
+def reset_hive_instance():
+    global _hive
+    with _hive_lock:
+        if _hive is not None:
+            _hive.dispose()
+        _hive = None
+
+
+def create_jobs(hive, analysis_name, inputs):
+    """
+    Create a job for each input data dict, in a single transaction: either all jobs are created or none is
+
+    Returns:
+        list: ids of the jobs created, in the order of the inputs
+    """
+    with Session() as session:
+        analysis = hive._get_analysis_by_name(analysis_name, session)
+        if analysis is None:
+            raise ValueError("Analysis %s not found" % analysis_name)
+        jobs = []
+        for input_data in inputs:
+            input_data['timestamp'] = time.ctime()
+            jobs.append(Job(input_id=dict_to_perl_string(input_data), status='READY',
+                            analysis_id=analysis.analysis_id))
+        session.add_all(jobs)
+        # Ids are assigned by the flush: read them before the commit expires the jobs, which would reload each
+        session.flush()
+        job_ids = [job.job_id for job in jobs]
+        session.commit()
+        return job_ids
+
+
+def _failed_descendant(job_id, depth):
+    """SQL condition on a job having a failed job among its descendants, up to depth levels below it"""
+    child = aliased(Job)
+    failed = child.status == 'FAILED'
+    if depth > 1:
+        failed = or_(failed, _failed_descendant(child.job_id, depth - 1))
+    return select(child.job_id).where(child.prev_job_id == job_id, failed).exists()
+
+
+def _job_status():
+    """
+    SQL expression of the status a job is listed with, for a query of jobs outer joined to their result. It is
+    the only definition of the statuses, used to filter and sort the job list as well as to display each job:
+    failed when the hive job or one of its descendants failed, or when any datacheck failed or none passed;
+    complete when the job is done with a result otherwise; and incomplete while it has no result yet.
+    """
+    failed_total = func.json_extract(Result.output, '$.failed_total')
+    passed_total = func.json_extract(Result.output, '$.passed_total')
+    done = Job.status == 'DONE'
+    return case(
+        (Job.status == 'FAILED', 'failed'),
+        (and_(done, Result.job_id.isnot(None)),
+         case((and_(failed_total == 0, passed_total > 0), 'complete'), else_='failed')),
+        (and_(done, _failed_descendant(Job.job_id, job_tree_depth)), 'failed'),
+        else_='incomplete')
+
+
+job_status = _job_status()
+
+# Columns the job list can be sorted on, by bootstrap-table field. Jobs are submitted in job_id order, so their
+# submission timestamp (only held in the perl-encoded input_id) sorts as job_id does. The other input parameters
+# cannot be sorted on in the database, and their columns are not sortable in list.html.
+sort_columns = {
+    'id': Job.job_id,
+    'input.timestamp': Job.job_id,
+    'output': Job.when_completed,
+    'status': job_status,
+}
+
+
+def status_condition(status):
+    """SQL condition selecting the jobs listed with the given status (see job_status)"""
+    if status not in statuses:
+        raise ValueError(f"Unknown status {status}, expected one of {', '.join(statuses)}")
+    return job_status == status
+
+
+def normalise_job_status(job, status):
+    """
+    Result of a job as returned by the hive, with the status it is listed with (see job_status) rather than the
+    status of its hive job tree: e.g. a job done without output yet is incomplete, and failed if any datacheck
+    failed or none passed.
+    """
+    job['status'] = status
+    return job
+
+
+def _job_result(hive, job, status, session, progress=False, fresh=False):
+    # status: job_status of the job; fresh: only use cached results in a terminal status
+    key = (job.job_id, progress)
+    result = job_results_cache.get(key)
+    if result is None or (fresh and not _is_final(result)):
+        result = normalise_job_status(hive._get_result_for_job(job, session, progress), status)
+        # A job without output may still get one (or be retried by the hive): only its output is final
+        ttl = None if _is_final(result) else dcg.JOB_RESULTS_CACHE_TTL
+        job_results_cache.set(key, result, ttl=ttl)
+    return dict(result)
+
+
+def _is_final(result):
+    return 'output' in result and result['status'] in terminal_statuses
+
+
+def get_job_result(hive, job_id, progress=True):
+    """
+    Result of a job, as returned by the hive but with its status normalised, served from the cache when it has
+    already reached a terminal status (or was fetched less than JOB_RESULTS_CACHE_TTL seconds ago)
+
+    Raises:
+        ValueError: if there is no such job
+    """
+    job_id = int(job_id)
+    result = job_results_cache.get((job_id, progress))
+    if result is not None:
+        return dict(result)
+    try:
+        with hive.read_session() as session:
+            return _job_result(hive, *_get_job(session, job_id), session, progress)
+    except ValueError:
+        if hive.read_engine is hive.engine:
+            raise
+    # Job just submitted, not replicated yet
+    with Session() as session:
+        return _job_result(hive, *_get_job(session, job_id), session, progress)
+
+
+def _get_job(session, job_id):
+    """Job and its job_status, raising ValueError if there is no such job"""
+    row = session.query(Job, job_status).outerjoin(Result, Result.job_id == Job.job_id) \
+        .filter(Job.job_id == job_id).first()
+    if row is None:
+        raise ValueError("Job %s not found" % job_id)
+    return row
+
+
+def search_condition(search):
+    """SQL condition on the job input parameters (either inline or in analysis_data) containing the search term"""
+    # The term is matched literally: LIKE wildcards typed in it are escaped
+    escaped = search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    pattern = f'%{escaped}%'
+    extended_data_ids = select(
+        literal('_extended_data_id ').concat(cast(AnalysisData.analysis_data_id, String))
+    ).where(AnalysisData.data.ilike(pattern, escape='\\'))
+    return or_(Job.input_id.ilike(pattern, escape='\\'), Job.input_id.in_(extended_data_ids))
+
+
+def encode_cursor(last_job_id, pending):
+    cursor = json.dumps({'last_job_id': last_job_id, 'pending': sorted(pending)}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(cursor.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Last job id and pending job ids of a cursor, raising ValueError if it was not made by encode_cursor"""
+    try:
+        decoded = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return int(decoded['last_job_id']), [int(job_id) for job_id in decoded['pending']]
+    except (binascii.Error, UnicodeError, TypeError, KeyError, ValueError) as e:
+        raise ValueError(f"Invalid cursor {cursor}") from e
+
+
+def _jobs_query(session, analysis_name):
+    return session.query(Job).join(Analysis).outerjoin(Result, Result.job_id == Job.job_id) \
+        .filter(Analysis.logic_name == analysis_name)
+
+
+def _jobs_cursor(session, analysis_name):
+    """
+    Cursor of the current state of the jobs: the last job submitted and the jobs still incomplete, which are
+    the only ones whose status can change. Only the JOBS_CURSOR_MAX_PENDING most recent incomplete jobs are
+    tracked, so that jobs that never complete (e.g. done without a result) eventually leave the cursor.
+
+    Returns:
+        tuple: the cursor, and the ids of the incomplete jobs it tracks
+    """
+    last_job_id = session.query(func.max(Job.job_id)).join(Analysis) \
+        .filter(Analysis.logic_name == analysis_name).scalar()
+    pending = [job_id for job_id, in _jobs_query(session, analysis_name).filter(status_condition('incomplete'))
+               .with_entities(Job.job_id).order_by(Job.job_id.desc()).limit(dcg.JOBS_CURSOR_MAX_PENDING)]
+    return encode_cursor(last_job_id or 0, pending), pending
+
+
+def get_jobs_page(hive, analysis_name, limit=None, offset=0, sort=None, order='desc', search=None, status=None):
+    """
+    Page of the jobs of an analysis, filtered, sorted and paginated in the hive database, so that only the jobs
+    returned are loaded and resolved.
+
+    Args:
+        hive (PooledHiveInstance): hive database
+        analysis_name (str): analysis the jobs were submitted to
+        limit (int): maximum number of jobs, all of them if None
+        offset (int): number of jobs skipped
+        sort (str): bootstrap-table field to sort on (see sort_columns), job_id if None or unknown
+        order (str): asc or desc
+        search (str): text contained in the job input parameters
+        status (str): one of statuses
+
+    Returns:
+        JobsPage: total number of jobs matching, the requested page of jobs as returned by the hive, and the
+        cursor to get the jobs changed since with get_jobs_since
+    """
+    column = sort_columns.get(sort, Job.job_id)
+    direction = column.asc if order == 'asc' else column.desc
+    with hive.read_session() as session:
+        cursor, _ = _jobs_cursor(session, analysis_name)
+        query = _jobs_query(session, analysis_name)
+        if search:
+            query = query.filter(search_condition(search))
+        if status:
+            query = query.filter(status_condition(status))
+        total = query.count()
+        query = query.order_by(direction(), Job.job_id.desc()).offset(offset)
+        if limit is not None:
+            query = query.limit(limit)
+        rows = [_job_result(hive, job, listed, session) for job, listed in query.add_columns(job_status).all()]
+    return JobsPage(total, rows, cursor)
+
+
+def get_jobs_since(hive, analysis_name, since):
+    """
+    Jobs of an analysis submitted or changed since a cursor: jobs submitted after it, jobs that were incomplete
+    then, and jobs incomplete now (which may have made progress), as tracked by cursors (see _jobs_cursor).
+
+    Args:
+        hive (PooledHiveInstance): hive database
+        analysis_name (str): analysis the jobs were submitted to
+        since (str): cursor returned by get_jobs_page or get_jobs_since
+
+    Returns:
+        JobsDelta: jobs as returned by the hive, by descending job_id, and the cursor for the next call
+    """
+    last_job_id, pending = decode_cursor(since)
+    with hive.read_session() as session:
+        cursor, pending_now = _jobs_cursor(session, analysis_name)
+        # The most recent ones, should the cursor have been made with a higher maximum
+        pending = set(sorted(pending, reverse=True)[:dcg.JOBS_CURSOR_MAX_PENDING] + pending_now)
+        changed = [Job.job_id > last_job_id]
+        if pending:
+            changed.append(Job.job_id.in_(pending))
+        jobs = _jobs_query(session, analysis_name).filter(or_(*changed)).add_columns(job_status) \
+            .order_by(Job.job_id.desc()).all()
+        rows = [_job_result(hive, job, status, session, fresh=True) for job, status in jobs]
+    return JobsDelta(rows, cursor)
@@ -0,0 +1,77 @@
+# See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+from ensembl.production.datacheck.search import SearchIndex
+
+
+class DatacheckIndex:
+    """Lookup structures over the datacheck ``index.json``, built once when the index is loaded.
+
+    The raw index maps a datacheck name to its parameters. Every lookup the catalog endpoints need
+    (by name, group or type, and the sorted name/group lists) is precomputed here, so that answering
+    a request never requires a scan of the whole index.
+    """
+
+    def __init__(self, datachecks=None):
+        self.datachecks = dict(datachecks or {})
+        self.groups = {}
+        self.types = {}
+        for name, params in self.datachecks.items():
+            for group in params['groups']:
+                self.groups.setdefault(group, []).append(params)
+            self.types.setdefault(params['datacheck_type'], []).append(params)
+        self.names_list = sorted(self.datachecks)
+        self.groups_list = sorted(self.groups)
+        self.types_list = sorted(self.types)
+        self.search_index = SearchIndex(self.datachecks)
+
+    def __len__(self):
+        return len(self.datachecks)
+
+    def __bool__(self):
+        return bool(self.datachecks)
+
+    def __contains__(self, name):
+        return name in self.datachecks
+
+    def __getitem__(self, name):
+        return self.datachecks[name]
+
+    def items(self):
+        return self.datachecks.items()
+
+    def search(self, query, limit=None):
+        """Datachecks matching a free-text query, ranked by relevance"""
+        return self.search_index.search(query, limit)
+
+    def by_name(self, name=None):
+        """Return ``{name: params}`` for every datacheck, or ``{name: [params]}`` for a single one."""
+        if name is None:
+            return self.datachecks
+        if name not in self.datachecks:
+            return {}
+        return {name: [self.datachecks[name]]}
+
+    def by_group(self, group=None):
+        """Return ``{group: [params, ...]}`` for every group, or for a single one."""
+        if group is None:
+            return self.groups
+        if group not in self.groups:
+            return {}
+        return {group: self.groups[group]}
+
+    def by_type(self, datacheck_type=None):
+        """Return ``{type: [params, ...]}`` for every datacheck type, or for a single one."""
+        if datacheck_type is None:
+            return self.types
+        if datacheck_type not in self.types:
+            return {}
+        return {datacheck_type: self.types[datacheck_type]}
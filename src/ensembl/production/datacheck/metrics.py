@@ -0,0 +1,69 @@
+# See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+"""
+Prometheus metrics of the service. Under gunicorn, PROMETHEUS_MULTIPROC_DIR must be set before this module is
+imported (see gunicorn_config.py): each worker then writes its metrics there, and /metrics aggregates those of
+all the workers whichever serves it.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, \
+    generate_latest
+from prometheus_client import multiprocess
+
+# Request and backend latencies range from cached lookups (ms) to large ES reports and slow hive queries (s)
+BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+
+request_duration = Histogram('datacheck_request_duration_seconds', 'Time to build the response of a request',
+                             ['endpoint', 'method', 'status'], buckets=BUCKETS)
+requests_in_progress = Gauge('datacheck_requests_in_progress', 'Requests being served, by worker',
+                             ['endpoint'], multiprocess_mode='liveall')
+backend_duration = Histogram('datacheck_backend_duration_seconds', 'Time of the calls to the backends',
+                             ['backend', 'operation'], buckets=BUCKETS)
+backend_errors = Counter('datacheck_backend_errors_total', 'Calls to the backends that failed',
+                         ['backend', 'operation'])
+cache_lookups = Counter('datacheck_cache_lookups_total', 'Cache lookups, by result (hit or miss)',
+                        ['cache', 'result'])
+cache_evictions = Counter('datacheck_cache_evictions_total', 'Cache entries evicted to make room for new ones',
+                          ['cache'])
+
+
+@contextmanager
+def backend_timer(backend, operation):
+    """Time a call to a backend, counting it as an error if it raises"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        backend_errors.labels(backend, operation).inc()
+        raise
+    finally:
+        backend_duration.labels(backend, operation).observe(time.perf_counter() - start)
+
+
+def observe_backend(backend, operation, duration, error=False):
+    """Record a call to a backend timed elsewhere"""
+    backend_duration.labels(backend, operation).observe(duration)
+    if error:
+        backend_errors.labels(backend, operation).inc()
+
+
+def latest():
+    """Metrics of all the workers, or of this process if not run with PROMETHEUS_MULTIPROC_DIR"""
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
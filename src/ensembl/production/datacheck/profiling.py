@@ -0,0 +1,106 @@
+# See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+import cProfile
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+formats = ('pstats', 'collapsed')
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of one thread every interval seconds, from a background thread, so that the profiled
+    code runs at full speed. Stacks are written in the collapsed format of flamegraph.pl and speedscope.
+
+    Args:
+        thread_id (int): thread to sample, the current one if None
+        interval (float): seconds between two samples
+    """
+
+    def __init__(self, thread_id=None, interval=0.005):
+        self.thread_id = threading.get_ident() if thread_id is None else thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def enable(self):
+        self._sampler = threading.Thread(target=self._sample, name='datacheck-profiler', daemon=True)
+        self._sampler.start()
+
+    def disable(self):
+        self._stop.set()
+        self._sampler.join()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def dump_stats(self, path):
+        with open(path, 'w') as collapsed:
+            for stack, count in self.stacks.most_common():
+                collapsed.write(f'{stack} {count}\n')
+
+
+class RequestProfile:
+    """
+    Profile of a single request: deterministic (cProfile, written as pstats) or sampled (written as collapsed
+    stacks), saved in directory as <timestamp>-<route>-<duration>ms.<format> once stopped.
+
+    Args:
+        directory (str): where profiles are written
+        route (str): route of the request, e.g. /jobs/details
+        profile_format (str): pstats or collapsed
+    """
+
+    def __init__(self, directory, route, profile_format='pstats'):
+        if profile_format not in formats:
+            raise ValueError(f"Unknown profile format {profile_format}, expected one of {', '.join(formats)}")
+        self.directory = directory
+        self.route = route
+        self.format = profile_format
+        self.profiler = cProfile.Profile() if profile_format == 'pstats' else SamplingProfiler()
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def stop(self):
+        """Stop profiling and write the profile, returning its path"""
+        self.profiler.disable()
+        duration = (time.perf_counter() - self.start) * 1000
+        route = re.sub(r'[^A-Za-z0-9_.-]+', '_', self.route).strip('_') or 'root'
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory,
+                            f"{time.strftime('%Y%m%dT%H%M%S')}-{route}-{duration:.0f}ms-{os.getpid()}.{self.format}")
+        self.profiler.dump_stats(path)
+        logger.info("Profile of %s (%.0f ms) written to %s", self.route, duration, path)
+        return path
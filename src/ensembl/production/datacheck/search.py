@@ -0,0 +1,153 @@
+# See the NOTICE file distributed with this work for additional information
+#    regarding copyright ownership.
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#        http://www.apache.org/licenses/LICENSE-2.0
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+import heapq
+import re
+import time
+from bisect import bisect_left
+
+import regex
+
+from ensembl.production.datacheck.exceptions import SearchTimeoutException
+
+# Split CamelCase names (SpeciesCommonName, AlignFeatureExternalDB), snake_case groups and free text
+token_re = re.compile(r'[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+')
+
+# Relevance of a term found in each field; prefix matches score half of an exact token match
+field_weights = {
+    'name': 10,
+    'group': 4,
+    'description': 1,
+}
+exact_name_bonus = 100
+
+
+def tokenize(text):
+    """Lower-cased word tokens of a name, group or description"""
+    return [token.lower() for token in token_re.findall(text or '')]
+
+
+class SearchIndex:
+    """Inverted index over datacheck names, descriptions and groups.
+
+    Every datacheck contributes its tokens, plus its whole lower-cased name and group names, so a query
+    is answered with a handful of dict lookups and a binary search for prefixes over the sorted
+    vocabulary, rather than by scanning the index.
+    """
+
+    def __init__(self, datachecks):
+        self.datachecks = datachecks
+        self.postings = {}
+        for name, params in datachecks.items():
+            self._add(name, 'name', [name.lower()] + tokenize(name))
+            for group in params.get('groups', []):
+                self._add(name, 'group', [group.lower()] + tokenize(group))
+            self._add(name, 'description', tokenize(params.get('description')))
+        self.vocabulary = sorted(self.postings)
+
+    def _add(self, name, field, tokens):
+        weight = field_weights[field]
+        for token in set(tokens):
+            scores = self.postings.setdefault(token, {})
+            scores[name] = scores.get(name, 0) + weight
+
+    def _prefixed(self, term):
+        for position in range(bisect_left(self.vocabulary, term), len(self.vocabulary)):
+            token = self.vocabulary[position]
+            if not token.startswith(term):
+                break
+            yield token
+
+    def _term_scores(self, tokens, term, candidates=None):
+        scores = {}
+        for token in tokens:
+            factor = 1 if token == term else 0.5
+            postings = self.postings[token]
+            if candidates is None or len(postings) <= len(candidates):
+                matches = postings.items()
+            else:
+                matches = ((name, postings[name]) for name in candidates if name in postings)
+            for name, weight in matches:
+                scores[name] = max(scores.get(name, 0), weight * factor)
+        return scores
+
+    def search(self, query, limit=None):
+        """Datachecks matching every term of the query (exactly or by prefix), best match first"""
+        terms = []
+        for term in set(tokenize(query)):
+            tokens = list(self._prefixed(term))
+            if not tokens:
+                return []
+            terms.append((sum(len(self.postings[token]) for token in tokens), term, tokens))
+        if not terms:
+            return []
+        # Start from the rarest term, so that common ones only need checking against the candidates left
+        scores = None
+        for _, term, tokens in sorted(terms):
+            term_scores = self._term_scores(tokens, term, scores)
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {name: score + term_scores[name] for name, score in scores.items() if name in term_scores}
+            if not scores:
+                return []
+        # Rank a datacheck named as typed first, then those whose name starts with the query
+        whole = query.strip().lower()
+        for name in scores:
+            if name.lower() == whole:
+                scores[name] += exact_name_bonus
+            elif name.lower().startswith(whole):
+                scores[name] += field_weights['name']
+        rank = lambda name: (-scores[name], name)
+        ranked = sorted(scores, key=rank) if limit is None else heapq.nsmallest(limit, scores, key=rank)
+        return [self.datachecks[name] for name in ranked]
+
+
+def compile_regex(pattern):
+    """Case-insensitive regular expression of a user query, raising ``re.error`` if it is invalid"""
+    try:
+        return regex.compile(pattern, regex.IGNORECASE)
+    except regex.error as e:
+        raise re.error(str(e), pattern) from None
+
+
+def regex_filter(items, pattern, timeout=1.0, limit=None, fields=lambda item: (item,)):
+    """Items of which one of the fields matches a regular expression, in order, up to ``limit`` of them.
+
+    The whole scan is given ``timeout`` seconds, which the regex module also enforces within a single match,
+    so a pathological pattern cannot hold up the worker thread. Raises ``re.error`` for an invalid pattern
+    and ``SearchTimeoutException`` when the time budget runs out.
+    """
+    compiled = compile_regex(pattern)
+    deadline = time.monotonic() + timeout
+    matches = []
+    for item in items:
+        if limit is not None and len(matches) >= limit:
+            break
+        for text in fields(item):
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise TimeoutError
+                found = compiled.search(text, timeout=remaining)
+            except TimeoutError:
+                raise SearchTimeoutException(f"Search for '{pattern}' did not complete within {timeout}s") from None
+            if found:
+                matches.append(item)
+                break
+    return matches
+
+
+def regex_search(datachecks, pattern, timeout=1.0, limit=None):
+    """Datachecks whose name or description matches a regular expression (see ``regex_filter``)"""
+    names = regex_filter(datachecks, pattern, timeout, limit,
+                         fields=lambda name: (name, datachecks[name].get('description') or ''))
+    return [datachecks[name] for name in names]
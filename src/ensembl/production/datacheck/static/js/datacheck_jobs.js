@@ -159,6 +159,7 @@ function parseDatabases(row) {
         '<h2 class="mb-0">' +
         '<button class="btn btn-outline-info btn-link" type="button" data-toggle="collapse" data-target="#collapseOneDB' + row.id + '" aria-expanded="true" aria-controls="collapseOne"> Database:' +
         '</button>' +
+        '<button class="btn btn-primary pull-right" type="button" Onclick="getalldetails(' + row.id + ')">All details</button>' +
         '</h2>' +
         '</div>');
 
@@ -190,7 +191,8 @@ function parseDatabases(row) {
         });
         html.push('</table>');
         html.push('</div>');
-        html.push('<div id="' + db_name + '_details"></div>');
+        html.push('<div id="' + db_name + '_details" class="datacheck-details" data-db-name="' + db_name
+            + '" data-jsonfile="' + row.output.json_output_file + '"></div>');
         html.push('</div>')
         html.push('</div>')
 
@@ -224,6 +226,9 @@ function detailFormatter(index, row) {
 
 
 function getdetails(id, json_path, db_name) {
+    if ($('#' + db_name + '_details').data('loaded')) {
+        return;
+    }
 
     document.getElementById(db_name + '_details').innerHTML =
         '<div class="d-flex justify-content-center"> <div class="spinner-border" role="status"> <span class="sr-only">Loading...</span> </div> </div></div>';
@@ -236,6 +241,39 @@ function getdetails(id, json_path, db_name) {
 }
 
 
+// Fetch the details of all the databases of a job with a single request, ready for when their panels are expanded
+function getalldetails(id) {
+    let panels = $('#collapseOneDB' + id + ' .datacheck-details');
+    let jsonfiles = [...new Set(panels.map(function () {
+        return $(this).data('jsonfile');
+    }).get())];
+    if (jsonfiles.length === 0) {
+        return;
+    }
+    panels.each(function () {
+        $(this).html('<div class="d-flex justify-content-center"> <div class="spinner-border" role="status"> <span class="sr-only">Loading...</span> </div> </div></div>');
+    });
+    $.ajax({
+        url: script_name + '/jobs/details/batch',
+        type: 'POST',
+        contentType: 'application/json',
+        data: JSON.stringify({jsonfiles: jsonfiles}),
+        dataType: 'json',
+        success: function (results) {
+            panels.each(function () {
+                let result = results[$(this).data('jsonfile')];
+                if (result === undefined || result.error !== undefined) {
+                    $(this).html('<div class="alert alert-danger m-2">' + (result ? result.error : 'No details found') + '</div>');
+                } else {
+                    $(this).html(parse_details($(this).data('db-name'), result));
+                    $(this).data('loaded', true);
+                }
+            });
+        }
+    });
+}
+
+
 function parse_details(db_name, result) {
 
     let html = [];
@@ -301,6 +339,65 @@ function rowStyle(row, index) {
 }
 
 
+// Cursor of the last job list received, to poll for the jobs submitted or changed since
+const jobs_poll_interval = 15000;
+let jobs_cursor = null;
+
+function jobsResponseHandler(res) {
+    if (res.cursor) {
+        jobs_cursor = res.cursor;
+    }
+    return res;
+}
+
+function cursorLastJobId(cursor) {
+    return JSON.parse(atob(cursor.replace(/-/g, '+').replace(/_/g, '/'))).last_job_id;
+}
+
+function pollJobs() {
+    if (jobs_cursor === null) {
+        return;
+    }
+    let last_job_id = cursorLastJobId(jobs_cursor);
+    $.getJSON(script_name + '/jobs', {format: 'json', since: jobs_cursor}, function (res) {
+        let $table = $('#table');
+        let submitted = false;
+        jobs_cursor = res.cursor;
+        $.each(res.rows, function (i, row) {
+            let current = $table.bootstrapTable('getRowByUniqueId', row.id);
+            if (current) {
+                // Re-rendering a row collapses its details: only update the jobs that actually changed
+                if (JSON.stringify([current.status, current.output]) !== JSON.stringify([row.status, row.output])) {
+                    $table.bootstrapTable('updateByUniqueId', {id: row.id, row: row, replace: true});
+                }
+            } else if (row.id > last_job_id) {
+                submitted = true;
+            }
+        });
+        if (submitted) {
+            $table.bootstrapTable('refresh', {silent: true});
+        }
+    });
+}
+
+
+// Live updates of a single job from its event stream, instead of polling the job list
+function watchJob(job_id) {
+    let source = new EventSource(script_name + '/jobs/' + job_id + '/events');
+    source.addEventListener('job', function (event) {
+        let row = JSON.parse(event.data);
+        let $table = $('#table');
+        let current = $table.bootstrapTable('getRowByUniqueId', row.id);
+        if (current && JSON.stringify([current.status, current.output]) !== JSON.stringify([row.status, row.output])) {
+            $table.bootstrapTable('updateByUniqueId', {id: row.id, row: row, replace: true});
+        }
+    });
+    source.addEventListener('end', function () {
+        source.close();
+    });
+}
+
+
 $(document).ready(function () {
 
     var $table = $('#table')
@@ -310,6 +407,7 @@ $(document).ready(function () {
     });
 
     $table.bootstrapTable('expandAllRows');
+    setInterval(pollJobs, jobs_poll_interval);
     $(".search").removeClass("float-right");
     $(".search").addClass("float-left");
 
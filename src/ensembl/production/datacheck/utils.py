@@ -10,11 +10,66 @@
 #    See the License for the specific language governing permissions and
 #    limitations under the License.
 
-from elasticsearch import ElasticsearchException
+import copy
+import json
+import os
+import re
+import ssl
+import threading
+import time
+from typing import NamedTuple
+from zipfile import ZipFile, ZipInfo
+
+import urllib3
+from elasticsearch import Elasticsearch, ElasticsearchException
+from elasticsearch.client.utils import _make_path
+from elasticsearch.connection import Urllib3HttpConnection, create_ssl_context
+from elasticsearch.serializer import Deserializer, JSONSerializer
+from ensembl.production.core.db_utils import get_db_type
 from sqlalchemy.engine import make_url
 
-from ensembl.production.core.es import ElasticsearchConnectionManager
+from ensembl.production.datacheck.cache import LRUCache
 from ensembl.production.datacheck.config import DatacheckConfig as dcg
+from ensembl.production.datacheck.metrics import backend_timer, observe_backend
+
+_es_clients = {}
+_es_clients_pid = None
+_es_clients_lock = threading.Lock()
+
+
+class CachedResult(NamedTuple):
+    report_time: object
+    content: bytes
+    checked_at: float
+
+
+# Datacheck results (raw JSON) by ES connection, index and json_output_file, bounded by their size in bytes
+results_cache = LRUCache('datacheck_results', dcg.ES_RESULTS_CACHE_SIZE, sizeof=lambda cached: len(cached.content))
+
+# Database types by (host, port, database): the schema type of a database does not change
+db_types_cache = LRUCache('db_types', dcg.DB_TYPES_CACHE_SIZE)
+
+# Types inferred from the Ensembl database naming conventions, tried in order. Databases whose name contains
+# cdna, otherfeatures or rnaseq are datachecked as such, although their schema is a core one.
+db_type_patterns = (
+    (re.compile('cdna|otherfeatures|rnaseq'), None),
+    (re.compile(r'_core_\d+(_\d+)?_\w+$'), 'core'),
+    (re.compile(r'_variation_\d+(_\d+)?_\w+$'), 'variation'),
+    (re.compile(r'_funcgen_\d+(_\d+)?_\w+$'), 'funcgen'),
+    (re.compile(r'^ensembl_compara_(\w+_)?\d+(_\d+)?$'), 'compara'),
+)
+
+# Only the document and sort value (report_time) of the latest report are searched for, its content is then
+# fetched on its own from the _source endpoint
+_latest_hit_filter_path = 'hits.hits._id,hits.hits._type,hits.hits.sort'
+# Report content and sort value of each response of a multi-search
+_content_filter_path = 'hits.hits._source.content,hits.hits.sort'
+# Start of a _source response limited to the content, the rest being the content itself up to the closing brace
+_raw_source_start = re.compile(rb'\s*\{\s*"content"\s*:')
+# Same, for each response of a multi-search, along with its error if it failed. Elasticsearch drops the responses
+# left empty by the filter, so took and status are kept to hold every response in place, hits or not.
+_batch_filter_path = ','.join(['responses.error', 'responses.status', 'responses.took'] +
+                              [f'responses.{path}' for path in _content_filter_path.split(',')])
 
 
 def qualified_name(db_uri):
@@ -30,15 +85,196 @@ def qualified_name(db_uri):
             return f"{db_url.drivername}://{db_url.username}@{host}:{db_url.port}/{db_url.database}"
 
 
+def infer_db_type(dbname):
+    """Type of a database according to its name, None if its name does not follow the naming conventions"""
+    for pattern, db_type in db_type_patterns:
+        match = pattern.search(dbname)
+        if match is not None:
+            return db_type or match.group()
+    return None
+
+
+def resolve_db_type(dbname, db_uri):
+    """
+    Type of a database, inferred from its name if possible, or else read from its meta table once per server
+    and database name.
+
+    Args:
+        dbname (str): database name
+        db_uri (str): URI of the database, used to query the meta table
+    """
+    db_type = infer_db_type(dbname)
+    if db_type is not None:
+        return db_type
+    db_uri = qualified_name(db_uri)
+    db_url = make_url(db_uri)
+    key = (db_url.host, db_url.port, db_url.database)
+    db_type = db_types_cache.get(key)
+    if db_type is None:
+        with backend_timer('mysql', 'db_type'):
+            db_type = get_db_type(db_uri)
+        db_types_cache.set(key, db_type)
+    return db_type
+
+
+class MeteredConnection(Urllib3HttpConnection):
+    """Elasticsearch connection recording the time taken by each request, and its failures"""
+
+    def log_request_success(self, method, full_url, path, body, status_code, response, duration):
+        observe_backend('elasticsearch', es_operation(method, path), duration)
+        super().log_request_success(method, full_url, path, body, status_code, response, duration)
+
+    def log_request_fail(self, method, full_url, path, body, duration, status_code=None, response=None,
+                         exception=None):
+        observe_backend('elasticsearch', es_operation(method, path), duration, error=True)
+        super().log_request_fail(method, full_url, path, body, duration, status_code, response, exception)
+
+
+def es_operation(method, path):
+    """Elasticsearch API called (_search, _msearch...), from the path of a request"""
+    endpoint = path.split('?', 1)[0].rstrip('/').rsplit('/', 1)[-1]
+    return endpoint if endpoint.startswith('_') else method.lower()
+
+
+class _ZipStream:
+    """Unseekable file object collecting what ZipFile writes, until it is drained by the generator"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_zip(paths, chunk_size=dcg.DOWNLOAD_CHUNK_SIZE):
+    """Generate a ZIP archive of the given files, chunk by chunk
+
+    Each file is read and yielded chunk_size bytes at a time, so the memory used does not depend on the size
+    of the files or of the archive. Entries are written with data descriptors (and ZIP64 records for large
+    files), since the archive is never rewound.
+
+    Args:
+        paths (list): files to archive, under their base name
+        chunk_size (int): number of bytes read at a time
+
+    Yields:
+        bytes: next part of the archive
+    """
+    stream = _ZipStream()
+    with ZipFile(stream, mode='w') as z:
+        for path in paths:
+            zinfo = ZipInfo.from_file(str(path), os.path.basename(path))
+            with open(path, 'rb') as src, z.open(zinfo, mode='w') as dest:
+                while True:
+                    chunk = src.read(chunk_size)
+                    if not chunk:
+                        break
+                    dest.write(chunk)
+                    yield stream.drain()
+            yield stream.drain()
+    yield stream.drain()
+
+
+def get_es_client(es_host: str = dcg.ES_HOST,
+                  es_port: int = int(dcg.ES_PORT),
+                  es_user: str = dcg.ES_USER,
+                  es_password: str = dcg.ES_PASSWORD,
+                  es_ssl: bool = dcg.ES_SSL):
+    """Get the Elasticsearch client of this process for the given connection details
+
+    Clients are created on first use and then shared by all requests (and threads) of the process, so that
+    their pooled keep-alive connections are reused. A process forked after clients were created (e.g. a
+    gunicorn worker of a preloaded app) gets its own clients rather than sharing the parent's sockets.
+
+    Args:
+        es_host (str): elastic search host to connect
+        es_port (int): elastic search port
+        es_user (str): elastic connexion config
+        es_password (str): elastic connexion config
+        es_ssl (bool): elastic connexion config
+
+    Returns:
+        Elasticsearch: client with a connection pool of ES_POOL_MAXSIZE, ES_TIMEOUT and ES_MAX_RETRIES
+    """
+    global _es_clients_pid
+    key = (es_host, int(es_port), es_user, es_password, es_ssl)
+    with _es_clients_lock:
+        if _es_clients_pid != os.getpid():
+            # Inherited from the parent process: drop without closing, the parent still owns the sockets
+            _es_clients.clear()
+            _es_clients_pid = os.getpid()
+        client = _es_clients.get(key)
+        if client is None:
+            urllib3.disable_warnings(category=urllib3.connectionpool.InsecureRequestWarning)
+            ssl_context = create_ssl_context()
+            ssl_context.check_hostname = False
+            ssl_context.verify_mode = ssl.CERT_NONE
+            client = Elasticsearch(hosts=[{'host': es_host, 'port': int(es_port)}],
+                                   scheme="https" if es_ssl else "http",
+                                   ssl_context=ssl_context,
+                                   http_auth=(es_user, es_password),
+                                   connection_class=MeteredConnection,
+                                   maxsize=dcg.ES_POOL_MAXSIZE,
+                                   timeout=dcg.ES_TIMEOUT,
+                                   max_retries=dcg.ES_MAX_RETRIES,
+                                   retry_on_timeout=True)
+            _es_clients[key] = client
+        return client
+
+
+def reset_es_clients():
+    """Close and forget the Elasticsearch clients of this process"""
+    with _es_clients_lock:
+        if _es_clients_pid == os.getpid():
+            for client in _es_clients.values():
+                client.transport.close()
+        _es_clients.clear()
+
+
+class RawJSONSerializer(JSONSerializer):
+    """Serializer encoding request bodies as JSON, but leaving response bodies undecoded (as bytes)"""
+
+    def loads(self, s):
+        return s if isinstance(s, bytes) else s.encode('utf-8')
+
+
+def raw_transport(es):
+    """
+    Transport of a client that returns response bodies undecoded. It is a copy of the client transport sharing
+    its connection pool, so requests go through the same connections and retries.
+    """
+    transport = getattr(es, 'raw_transport', None)
+    if transport is None:
+        transport = copy.copy(es.transport)
+        transport.deserializer = Deserializer({'application/json': RawJSONSerializer()})
+        es.raw_transport = transport
+    return transport
+
+
 def get_datacheck_results(jsonfile_path: str,
                           es_host: str = dcg.ES_HOST,
                           es_port: int = int(dcg.ES_PORT),
                           es_index: str = dcg.ES_INDEX,
                           es_user: str = dcg.ES_USER,
                           es_password=dcg.ES_PASSWORD,
-                          es_ssl=dcg.ES_SSL):
+                          es_ssl=dcg.ES_SSL,
+                          raw: bool = False):
     """Get datacheck results stored in Elasticsearch
 
+    The latest report of the file is searched for, then its content alone is fetched from the _source endpoint
+    and kept as the JSON bytes returned by Elasticsearch, without being decoded. Results are cached in the process.
+    A cached result older than ES_RESULTS_CACHE_REVALIDATE seconds is only served again after checking that no
+    newer report has been indexed for the same file.
+
     Args:
         jsonfile_path (str): unique file name to filter the results
         es_host (str): elastic search host to connect 
@@ -47,32 +283,156 @@ def get_datacheck_results(jsonfile_path: str,
         es_ssl (bool): elastic connexion config
         es_password (str): elastic connexion config
         es_user (str): elastic connexion config
+        raw (bool): return the results as JSON bytes rather than decoded
 
     Returns:
         dict: status with elasticsearch response 
     """
-    with ElasticsearchConnectionManager(es_host, es_port, es_user, es_password, es_ssl) as es:
-        try:
-            res = es.client.search(index=es_index, body={
-                "query": {
-                    "term": {
-                        "file.keyword": jsonfile_path
-                    }
-                },
-                "size": 1,
-                "sort": [
-                    {
-                        "report_time": {
-                            "unmapped_type": "keyword",
-                            "order": "desc"
-                        }
-                    }
-                ]
-            })
-            if len(res['hits']['hits']) == 0:
-                raise ElasticsearchException(f"""No Hits Found for given params jsonfile_path {jsonfile_path}""")
-
-            return {"status": True, "message": "", "result": res['hits']['hits'][0]['_source']['content']}
+    key = (es_host, int(es_port), es_index, jsonfile_path)
+    try:
+        es = get_es_client(es_host, es_port, es_user, es_password, es_ssl)
+        cached = results_cache.get(key)
+        now = time.time()
+        if cached is None or now - cached.checked_at >= dcg.ES_RESULTS_CACHE_REVALIDATE:
+            res = es.search(index=es_index, body=latest_report_query(jsonfile_path, source=False),
+                            filter_path=_latest_hit_filter_path)
+            hit = _first_hit(res)
+            if hit is None:
+                cached = _cache_result(key, None, None)
+            elif cached is not None and hit['sort'][0] == cached.report_time:
+                results_cache.set(key, cached._replace(checked_at=now))
+            else:
+                path = _make_path(es_index, hit['_type'], hit['_id'], '_source')
+                source = raw_transport(es).perform_request('GET', path, params={'_source_includes': 'content'})
+                cached = _cache_result(key, _raw_content(source), hit['sort'][0])
+        content = cached.content if raw else json.loads(cached.content)
+        return {"status": True, "message": "", "result": content}
+
+    except Exception as err:
+        return {"status": False, "message": str(err)}
+
+
+def get_datacheck_results_batch(jsonfile_paths,
+                                es_host: str = dcg.ES_HOST,
+                                es_port: int = int(dcg.ES_PORT),
+                                es_index: str = dcg.ES_INDEX,
+                                es_user: str = dcg.ES_USER,
+                                es_password=dcg.ES_PASSWORD,
+                                es_ssl=dcg.ES_SSL):
+    """Get the raw datacheck results of several files, with a single Elasticsearch multi-search for those not cached
+
+    Cached results still within ES_RESULTS_CACHE_REVALIDATE seconds are served as is; all other files are
+    fetched again in full. Unlike single results, the multi-search response is decoded, and each report is
+    encoded once before it is cached.
+
+    Args:
+        jsonfile_paths (list): unique file names to filter the results
+        es_host (str): elastic search host to connect
+        es_port (int): elastic search port
+        es_index (str): elastic search index where dc results are stored
+        es_ssl (bool): elastic connexion config
+        es_password (str): elastic connexion config
+        es_user (str): elastic connexion config
 
+    Returns:
+        dict: status with elasticsearch response as JSON bytes, by file name
+    """
+    results = {}
+    missing = []
+    now = time.time()
+    for jsonfile_path in dict.fromkeys(jsonfile_paths):
+        cached = results_cache.get((es_host, int(es_port), es_index, jsonfile_path))
+        if cached is not None and now - cached.checked_at < dcg.ES_RESULTS_CACHE_REVALIDATE:
+            results[jsonfile_path] = {"status": True, "message": "", "result": cached.content}
+        else:
+            missing.append(jsonfile_path)
+    if not missing:
+        return results
+
+    body = []
+    for jsonfile_path in missing:
+        body.append({"index": es_index})
+        body.append(latest_report_query(jsonfile_path, source=['content']))
+    try:
+        es = get_es_client(es_host, es_port, es_user, es_password, es_ssl)
+        responses = es.msearch(body=body, filter_path=_batch_filter_path)
+        responses = responses.get('responses', [])
+        if len(responses) != len(missing):
+            raise ElasticsearchException(f"Multi-search returned {len(responses)} responses for {len(missing)} files")
+    except Exception as err:
+        results.update({jsonfile_path: {"status": False, "message": str(err)} for jsonfile_path in missing})
+        return results
+
+    for jsonfile_path, res in zip(missing, responses):
+        key = (es_host, int(es_port), es_index, jsonfile_path)
+        try:
+            if 'error' in res:
+                raise ElasticsearchException(res['error'])
+            cached = _cache_hit(key, _first_hit(res))
+            results[jsonfile_path] = {"status": True, "message": "", "result": cached.content}
         except Exception as err:
-            return {"status": False, "message": str(err)}
+            results[jsonfile_path] = {"status": False, "message": str(err)}
+    return results
+
+
+def latest_report_query(jsonfile_path, source=True):
+    """Search body for the most recent report of a datacheck results file"""
+    return {
+        "query": {
+            "term": {
+                "file.keyword": jsonfile_path
+            }
+        },
+        "size": 1,
+        "sort": [
+            {
+                "report_time": {
+                    "unmapped_type": "keyword",
+                    "order": "desc"
+                }
+            }
+        ],
+        "_source": source
+    }
+
+
+def _encode_content(content):
+    if isinstance(content, str):
+        return content.encode('utf-8')
+    return json.dumps(content).encode('utf-8')
+
+
+def _first_hit(res):
+    hits = res.get('hits', {}).get('hits', [])
+    if len(hits) == 0:
+        return None
+    return hits[0]
+
+
+def _raw_content(source):
+    """Report content, as JSON bytes, of a _source response limited to the content: {"content": <report>}"""
+    start = _raw_source_start.match(source)
+    source = source.rstrip()
+    if start is None or not source.endswith(b'}'):
+        return None
+    content = source[start.end():-1].strip()
+    if content.startswith(b'"'):
+        # Report stored as a JSON string rather than an object
+        content = json.loads(content).encode('utf-8')
+    return content
+
+
+def _cache_hit(key, hit):
+    """Cache the report of a search hit, encoded once so that it is served as is from then on"""
+    if hit is None:
+        return _cache_result(key, None, None)
+    return _cache_result(key, _encode_content(hit['_source']['content']), hit['sort'][0])
+
+
+def _cache_result(key, content, report_time):
+    if content is None:
+        results_cache.pop(key)
+        raise ElasticsearchException(f"""No Hits Found for given params jsonfile_path {key[-1]}""")
+    cached = CachedResult(report_time, content, time.time())
+    results_cache.set(key, cached)
+    return cached
@@ -0,0 +1,43 @@
+# .. See the NOTICE file distributed with this work for additional information
+#     regarding copyright ownership.
+#     Licensed under the Apache License, Version 2.0 (the "License");
+#     you may not use this file except in compliance with the License.
+#     You may obtain a copy of the License at
+#         http://www.apache.org/licenses/LICENSE-2.0
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+import time
+
+from ensembl.production.datacheck.cache import LRUCache, caches
+
+
+def test_evicts_least_recently_used_by_size():
+    cache = LRUCache('test_lru', 10, sizeof=len)
+    cache.set('a', 'xxxx')
+    cache.set('b', 'xxxx')
+    assert cache.get('a') == 'xxxx'
+    cache.set('c', 'xxxx')
+    assert cache.get('b') is None
+    assert cache.get('a') == 'xxxx'
+    assert cache.size == 8
+    assert cache.stats()['evictions'] == 1
+    # Larger than the whole cache: not stored
+    cache.set('d', 'x' * 11)
+    assert 'd' not in cache._entries
+    assert caches['test_lru'] is cache
+
+
+def test_ttl_and_stats():
+    cache = LRUCache('test_ttl', 10)
+    cache.set('a', 1, ttl=0.05)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    time.sleep(0.1)
+    assert cache.get('a') is None
+    assert cache.get('b') == 2
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (2, 1, 1)
+    assert stats['hit_ratio'] == 2 / 3
@@ -0,0 +1,132 @@
+# .. See the NOTICE file distributed with this work for additional information
+#     regarding copyright ownership.
+#     Licensed under the Apache License, Version 2.0 (the "License");
+#     you may not use this file except in compliance with the License.
+#     You may obtain a copy of the License at
+#         http://www.apache.org/licenses/LICENSE-2.0
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+import os
+import threading
+import time
+
+from ensembl.production.datacheck.catalog import Catalog
+
+datachecks = {
+    "SpeciesCommonName": {
+        "name": "SpeciesCommonName",
+        "description": "Species common name is defined in the meta table",
+        "datacheck_type": "critical",
+        "groups": ["core", "meta"]
+    }
+}
+
+updated_datachecks = dict(datachecks, CompareMetaKeys={
+    "name": "CompareMetaKeys",
+    "description": "Compare meta key counts between two databases",
+    "datacheck_type": "advisory",
+    "groups": ["compare_core"]
+})
+
+server_names = {
+    "mysql://ensro@server-2:3306/": {"server_name": "server-2", "config_profile": "vertebrates"},
+    "mysql://ensro@server-1:3306/": {"server_name": "server-1", "config_profile": "vertebrates"}
+}
+
+
+def test_initial_snapshot():
+    snapshot = Catalog(datachecks, server_names).snapshot
+    assert snapshot.version == 1
+    assert snapshot.index.names_list == ["SpeciesCommonName"]
+    assert snapshot.servers_list == ["mysql://ensro@server-1:3306/", "mysql://ensro@server-2:3306/"]
+
+
+def test_reload_publishes_new_snapshot():
+    loaded = [None, updated_datachecks]
+    catalog = Catalog(datachecks, server_names, index_loader=loaded.pop, servers_loader=lambda: server_names)
+    first = catalog.snapshot
+    reloaded = catalog.reload()
+    assert reloaded is catalog.snapshot
+    assert reloaded.version == 2
+    assert reloaded.index.names_list == ["CompareMetaKeys", "SpeciesCommonName"]
+    assert reloaded.server_names is first.server_names
+    # Earlier snapshot is left untouched for requests still using it
+    assert first.index.names_list == ["SpeciesCommonName"]
+
+
+def test_reload_without_changes_keeps_version():
+    catalog = Catalog(datachecks, server_names, index_loader=lambda: None, servers_loader=lambda: dict(server_names))
+    assert catalog.reload() is catalog.snapshot
+    assert catalog.snapshot.version == 1
+
+
+def test_reload_in_background():
+    new_servers = {"mysql://ensro@server-3:3306/": {"server_name": "server-3", "config_profile": "vertebrates"}}
+    catalog = Catalog(datachecks, server_names, servers_loader=lambda: new_servers)
+    catalog.reload_in_background().join()
+    assert catalog.snapshot.version == 2
+    assert catalog.snapshot.servers_list == ["mysql://ensro@server-3:3306/"]
+
+
+def test_reload_in_background_runs_once_at_a_time():
+    started, release = threading.Event(), threading.Event()
+
+    def servers_loader():
+        started.set()
+        release.wait(5)
+        return server_names
+
+    catalog = Catalog(datachecks, server_names, servers_loader=servers_loader)
+    reloader = catalog.reload_in_background()
+    started.wait(5)
+    assert catalog.reload_in_background() is reloader
+    release.set()
+    reloader.join()
+
+
+def test_polling_survives_failed_reload():
+    loaded = [updated_datachecks, {"Malformed": None}]
+    catalog = Catalog(datachecks, server_names, index_loader=lambda: loaded.pop() if len(loaded) > 1 else loaded[0])
+    poller = catalog.start_polling(0.01)
+    deadline = time.time() + 5
+    while catalog.snapshot.version == 1 and time.time() < deadline:
+        time.sleep(0.01)
+    assert poller.is_alive()
+    assert catalog.snapshot.index.names_list == ["CompareMetaKeys", "SpeciesCommonName"]
+
+
+def test_catalog_reload_requires_token(appclient):
+    app = appclient.application
+    token = app.config['CATALOG_RELOAD_TOKEN']
+    try:
+        app.config['CATALOG_RELOAD_TOKEN'] = ''
+        assert appclient.post('/catalog/reload').status_code == 403
+        app.config['CATALOG_RELOAD_TOKEN'] = 'secret'
+        assert appclient.post('/catalog/reload', headers={'X-Reload-Token': 'wrong'}).status_code == 403
+        response = appclient.post('/catalog/reload', headers={'X-Reload-Token': 'secret'})
+        assert response.status_code == 202
+        assert response.json['worker'] == os.getpid()
+    finally:
+        app.config['CATALOG_RELOAD_TOKEN'] = token
+
+
+def test_digest_depends_on_content_only():
+    first = Catalog(datachecks, server_names).snapshot
+    second = Catalog(dict(datachecks), dict(server_names)).snapshot
+    assert first.digest == second.digest
+    assert Catalog(updated_datachecks, server_names).snapshot.digest != first.digest
+
+
+def test_catalog_conditional_get(appclient):
+    response = appclient.get('/names/list')
+    assert response.status_code == 200
+    assert response.cache_control.max_age is not None
+    etag = response.headers['ETag']
+    response = appclient.get('/names/list', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    response = appclient.get('/servers/dict', headers={'If-None-Match': '"stale"'})
+    assert response.status_code == 200
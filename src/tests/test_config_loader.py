@@ -9,7 +9,9 @@
 #   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
+import tempfile
 import unittest
+from unittest import mock
 import pkg_resources
 from pathlib import Path
 import ensembl.production.datacheck.exceptions
@@ -33,6 +35,27 @@ class TestConfigLoader(unittest.TestCase):
         # Load main instead
         self.assertIn('SpeciesCommonName', config.keys())
 
+    def test_config_cache(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            config = DCConfigLoader.load_cached_config('106', cache_dir)
+            self.assertIn('DuplicateComparaMemberXref', config.keys())
+            self.assertTrue(DCConfigLoader.cache_file('106', cache_dir).exists())
+            # Served from the cache without any download
+            with mock.patch.object(DCConfigLoader, 'fetch', side_effect=AssertionError('Unexpected download')):
+                self.assertEqual(config, DCConfigLoader.load_cached_config('106', cache_dir))
+            # Unchanged since it was cached
+            self.assertIsNone(DCConfigLoader.refresh('106', cache_dir))
+
+    def test_config_cache_refresh(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            DCConfigLoader.write_cache('106', cache_dir, {'url': None, 'etag': None, 'last_modified': None,
+                                                          'index': {'Stale': {}}})
+            self.assertEqual({'Stale': {}}, DCConfigLoader.load_cached_config('106', cache_dir))
+            refreshed = DCConfigLoader.refresh('106', cache_dir)
+            self.assertIn('DuplicateComparaMemberXref', refreshed.keys())
+            self.assertEqual(refreshed, DCConfigLoader.load_cached_config('106', cache_dir))
+
+
 class TestAPPVersion(unittest.TestCase):
 
     def test_config_app_version(self):
@@ -0,0 +1,128 @@
+# .. See the NOTICE file distributed with this work for additional information
+#     regarding copyright ownership.
+#     Licensed under the Apache License, Version 2.0 (the "License");
+#     you may not use this file except in compliance with the License.
+#     You may obtain a copy of the License at
+#         http://www.apache.org/licenses/LICENSE-2.0
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+import re
+import threading
+
+import pytest
+
+from ensembl.production.datacheck.databases import DatabaseCatalogue, DatabaseCatalogues
+from ensembl.production.datacheck.exceptions import SearchTimeoutException
+
+names = [
+    "homo_sapiens_core_110_38",
+    "homo_sapiens_variation_110_38",
+    "Mus_musculus_core_110_39",
+    "mus_musculus_funcgen_110_39",
+    "ensembl_compara_110",
+]
+
+
+def test_prefix():
+    catalogue = DatabaseCatalogue(names)
+    assert catalogue.prefix("homo_sapiens_") == ["homo_sapiens_core_110_38", "homo_sapiens_variation_110_38"]
+    assert catalogue.prefix("MUS") == ["Mus_musculus_core_110_39", "mus_musculus_funcgen_110_39"]
+    assert catalogue.prefix("mus", limit=1) == ["Mus_musculus_core_110_39"]
+    assert catalogue.prefix("rattus") == []
+    assert len(catalogue.prefix("")) == len(names)
+
+
+def test_search():
+    catalogue = DatabaseCatalogue(names)
+    assert catalogue.search("core_110") == ["Mus_musculus_core_110_39", "homo_sapiens_core_110_38"]
+    assert catalogue.search("^ensembl") == ["ensembl_compara_110"]
+    assert catalogue.search(None, limit=2) == sorted(names)[:2]
+    with pytest.raises(re.error):
+        catalogue.search("(")
+
+
+def test_search_timeout():
+    catalogue = DatabaseCatalogue(["a" * 30 + "!"])
+    with pytest.raises(SearchTimeoutException):
+        catalogue.search("(a|aa)+$", timeout=0.2)
+
+
+def test_loaded_once():
+    loads = []
+    catalogues = DatabaseCatalogues(lambda uri: loads.append(uri) or names, ttl=60, max_stale=600)
+    first = catalogues.get("mysql://server-1:3306/")
+    assert catalogues.get("mysql://server-1:3306/") is first
+    assert loads == ["mysql://server-1:3306/"]
+
+
+def test_stale_served_while_reloading():
+    reloaded = threading.Event()
+    loaded = [["new_db"], names]
+
+    def loader(uri):
+        databases = loaded.pop()
+        if not loaded:
+            reloaded.set()
+        return databases
+
+    catalogues = DatabaseCatalogues(loader, ttl=0, max_stale=600)
+    first = catalogues.get("mysql://server-1:3306/")
+    assert catalogues.get("mysql://server-1:3306/") is first
+    assert reloaded.wait(5)
+    for _ in range(50):
+        if catalogues.cache.get("mysql://server-1:3306/") is not first:
+            break
+        reloaded.wait(0.1)
+    assert catalogues.get("mysql://server-1:3306/").names == ["new_db"]
+
+
+def test_too_stale_reloaded_before_serving():
+    loaded = [["new_db"], names]
+    catalogues = DatabaseCatalogues(lambda uri: loaded.pop(), ttl=0, max_stale=0)
+    catalogues.get("mysql://server-1:3306/")
+    assert catalogues.get("mysql://server-1:3306/").names == ["new_db"]
+
+
+def test_concurrent_loads_coalesced():
+    started = threading.Event()
+    release = threading.Event()
+    loads = []
+
+    def loader(uri):
+        loads.append(uri)
+        started.set()
+        release.wait(5)
+        return names
+
+    catalogues = DatabaseCatalogues(loader, ttl=60, max_stale=600)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(catalogues.get("mysql://server-1:3306/")))
+               for _ in range(5)]
+    threads[0].start()
+    assert started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert loads == ["mysql://server-1:3306/"]
+    assert len(results) == 5 and all(result is results[0] for result in results)
+
+
+def test_failed_load_not_cached():
+    def loader(uri):
+        raise RuntimeError("server unavailable")
+
+    catalogues = DatabaseCatalogues(loader, ttl=60, max_stale=600)
+    with pytest.raises(RuntimeError):
+        catalogues.get("mysql://server-1:3306/")
+    assert not catalogues.loading("mysql://server-1:3306/")
+    assert catalogues.cache.get("mysql://server-1:3306/") is None
+
+
+def test_databases_list_invalid_parameters(appclient):
+    assert appclient.get('/databases/list').status_code == 400
+    assert appclient.get('/databases/list?db_uri=mysql://ensro@localhost:3306/&limit=-1').status_code == 400
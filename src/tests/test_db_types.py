@@ -0,0 +1,52 @@
+# .. See the NOTICE file distributed with this work for additional information
+#     regarding copyright ownership.
+#     Licensed under the Apache License, Version 2.0 (the "License");
+#     you may not use this file except in compliance with the License.
+#     You may obtain a copy of the License at
+#         http://www.apache.org/licenses/LICENSE-2.0
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+from unittest import mock
+
+import pytest
+
+from ensembl.production.datacheck import utils
+from ensembl.production.datacheck.utils import infer_db_type, resolve_db_type
+
+
+@pytest.mark.parametrize("dbname,db_type", [
+    ("homo_sapiens_core_110_38", "core"),
+    ("bacteria_0_collection_core_57_110_1", "core"),
+    ("homo_sapiens_variation_110_38", "variation"),
+    ("mus_musculus_funcgen_110_39", "funcgen"),
+    ("ensembl_compara_110", "compara"),
+    ("ensembl_compara_plants_57_110", "compara"),
+    ("homo_sapiens_cdna_110_38", "cdna"),
+    ("homo_sapiens_otherfeatures_110_38", "otherfeatures"),
+    ("mus_musculus_rnaseq_110_39", "rnaseq"),
+    ("ensembl_ontology_110", None),
+    ("my_test_db", None),
+])
+def test_infer_db_type(dbname, db_type):
+    assert infer_db_type(dbname) == db_type
+
+
+def test_resolve_db_type_cached():
+    utils.db_types_cache.clear()
+    with mock.patch.object(utils, 'get_db_type', return_value='core') as get_db_type:
+        for user in ('ensro', 'ensadmin'):
+            assert resolve_db_type('my_test_db', f'mysql://{user}@localhost:3306/my_test_db') == 'core'
+        assert resolve_db_type('homo_sapiens_variation_110_38',
+                               'mysql://ensro@localhost:3306/homo_sapiens_variation_110_38') == 'variation'
+    get_db_type.assert_called_once_with('mysql://ensro@localhost:3306/my_test_db')
+
+
+def test_resolve_db_type_errors_not_cached():
+    utils.db_types_cache.clear()
+    with mock.patch.object(utils, 'get_db_type', side_effect=[RuntimeError('unreachable'), 'core']):
+        with pytest.raises(RuntimeError):
+            resolve_db_type('my_test_db', 'mysql://ensro@localhost:3306/my_test_db')
+        assert resolve_db_type('my_test_db', 'mysql://ensro@localhost:3306/my_test_db') == 'core'
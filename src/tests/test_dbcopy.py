@@ -0,0 +1,86 @@
+# .. See the NOTICE file distributed with this work for additional information
+#     regarding copyright ownership.
+#     Licensed under the Apache License, Version 2.0 (the "License");
+#     you may not use this file except in compliance with the License.
+#     You may obtain a copy of the License at
+#         http://www.apache.org/licenses/LICENSE-2.0
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+import threading
+from unittest import mock
+
+import pytest
+import requests
+
+from ensembl.production.datacheck.dbcopy import DbCopyClient, LatencyStats
+
+
+def fake_response(databases, status_code=200):
+    response = requests.models.Response()
+    response.status_code = status_code
+    response._content = requests.compat.json.dumps(databases).encode()
+    return response
+
+
+@pytest.fixture
+def client():
+    return DbCopyClient("http://dbcopy:80/", timeout=(1, 2), ttl=60, max_entries=10)
+
+
+def test_databases_cached(client):
+    with mock.patch.object(requests.Session, 'get', return_value=fake_response(["homo_sapiens_core_110_38"])) as get:
+        assert client.databases("server-1", 3306, "homo") == ["homo_sapiens_core_110_38"]
+        assert client.databases("server-1", "3306", "homo") == ["homo_sapiens_core_110_38"]
+        client.databases("server-1", 3306, "mus")
+    assert get.call_count == 2
+    get.assert_any_call("http://dbcopy:80/api/dbcopy/databases/server-1/3306", params={'search': 'homo'},
+                        timeout=(1, 2))
+    assert client.latency.stats()['count'] == 2
+
+
+def test_errors_raised_and_not_cached(client):
+    responses = [fake_response(["homo_sapiens_core_110_38"]), fake_response({}, 500)]
+    with mock.patch.object(requests.Session, 'get', side_effect=lambda *args, **kwargs: responses.pop()):
+        with pytest.raises(requests.exceptions.HTTPError):
+            client.databases("server-1", 3306, "homo")
+        assert client.databases("server-1", 3306, "homo") == ["homo_sapiens_core_110_38"]
+    assert client.latency.stats()['errors'] == 1
+
+
+def test_concurrent_requests_coalesced(client):
+    started = threading.Event()
+    release = threading.Event()
+
+    def get(*args, **kwargs):
+        started.set()
+        release.wait(5)
+        return fake_response(["homo_sapiens_core_110_38"])
+
+    results = []
+    with mock.patch.object(requests.Session, 'get', side_effect=get) as session_get:
+        threads = [threading.Thread(target=lambda: results.append(client.databases("server-1", 3306, "homo")))
+                   for _ in range(5)]
+        threads[0].start()
+        assert started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join(5)
+    assert session_get.call_count == 1
+    assert results == [["homo_sapiens_core_110_38"]] * 5
+
+
+def test_latency_stats():
+    latency = LatencyStats(window=10)
+    for duration in range(1, 21):
+        latency.observe(duration / 10, error=duration == 20)
+    stats = latency.stats()
+    assert stats['count'] == 20
+    assert stats['errors'] == 1
+    assert stats['max'] == 2.0
+    # Percentiles over the 10 most recent calls only
+    assert stats['p50'] == 1.6
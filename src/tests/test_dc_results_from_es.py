@@ -10,6 +10,10 @@
 #     See the License for the specific language governing permissions and
 #     limitations under the License.
 import json
+from unittest import mock
+
+from elasticsearch import Elasticsearch
+from elasticsearch.connection import Connection
 
 
 def test_without_jsonfile_param(appclient):
@@ -36,3 +40,136 @@ def test_get_dc_results_failed(appclient, elastic_search, es_query):
     data = json.loads(response.data)
     assert response.status_code == 200
     assert len(data.keys()) == 2
+
+
+def test_es_client_is_shared(appclient):
+    from ensembl.production.datacheck.utils import get_es_client, reset_es_clients
+    client = get_es_client('localhost', 9200, '', '', False)
+    assert client is get_es_client('localhost', '9200', '', '', False)
+    assert client.ping()
+    reset_es_clients()
+    assert client is not get_es_client('localhost', 9200, '', '', False)
+
+
+def test_dc_results_are_cached(appclient, elastic_search, es_query):
+    from ensembl.production.datacheck.utils import results_cache
+    elastic_search(es_query)
+    results_cache.clear()
+    url = '/jobs/details?jsonfile=/homes/user/test_es_output/user_sL3mnrNTRrr1/results_by_species.json'
+    hits = results_cache.hits
+    first = json.loads(appclient.get(url).data)
+    second = json.loads(appclient.get(url).data)
+    assert first == second
+    assert results_cache.hits == hits + 1
+    stats = json.loads(appclient.get('/cache/stats').data)
+    assert stats['datacheck_results']['entries'] == 1
+
+
+def test_get_dc_results_batch(appclient, elastic_search, es_query):
+    elastic_search(es_query)
+    success = '/homes/user/test_es_output/user_sL2nmrNTRkjE/results_by_species.json'
+    failed = '/homes/user/test_es_output/user_sL3mnrNTRrr1/results_by_species.json'
+    missing = '/homes/user/test_es_output/missing/results_by_species.json'
+    response = appclient.post('/jobs/details/batch', json={'jsonfiles': [success, failed, missing]})
+    data = json.loads(response.data)
+    assert response.status_code == 200
+    assert data[success] == {}
+    assert len(data[failed].keys()) == 2
+    assert 'No Hits Found' in data[missing]['error']
+
+
+def test_get_dc_results_batch_without_jsonfiles(appclient):
+    response = appclient.post('/jobs/details/batch', json={'jsonfile': 'results_by_species.json'})
+    assert response.status_code == 400
+
+
+def test_get_dc_results_raw_and_pretty(appclient, elastic_search, es_query):
+    elastic_search(es_query)
+    url = '/jobs/details?jsonfile=/homes/user/test_es_output/user_sL3mnrNTRrr1/results_by_species.json'
+    raw = appclient.get(url)
+    pretty = appclient.get(url + '&pretty=1')
+    assert raw.content_type == 'application/json'
+    assert b'\n' not in raw.data
+    assert b'\n  ' in pretty.data
+    assert json.loads(raw.data) == json.loads(pretty.data)
+
+
+def test_encode_content():
+    from ensembl.production.datacheck.utils import _encode_content
+    assert _encode_content({"species": {"ok": 1}}) == b'{"species": {"ok": 1}}'
+    # Report stored as a JSON string rather than an object
+    assert _encode_content('{"species": {}}') == b'{"species": {}}'
+
+
+def test_raw_content():
+    from ensembl.production.datacheck.utils import _raw_content
+    assert _raw_content(b'{"content":{"species":{"ok":1}}}') == b'{"species":{"ok":1}}'
+    assert _raw_content(b'{ "content" : {"species": {"tests": {"a}": "ok"}}} }\n') == \
+           b'{"species": {"tests": {"a}": "ok"}}}'
+    assert _raw_content(b'{"content":"{\\"species\\": {}}"}') == b'{"species": {}}'
+    assert _raw_content(b'{}') is None
+
+
+class SourceConnection(Connection):
+    def perform_request(self, method, url, params=None, body=None, timeout=None, ignore=(), headers=None):
+        return 200, {'content-type': 'application/json'}, '{"content":{"species":{}}}'
+
+
+def test_raw_transport():
+    from ensembl.production.datacheck.utils import raw_transport
+    es = Elasticsearch(connection_class=SourceConnection)
+    transport = raw_transport(es)
+    assert transport is raw_transport(es)
+    assert transport.connection_pool is es.transport.connection_pool
+    assert transport.perform_request('GET', '/index/_doc/1/_source') == b'{"content":{"species":{}}}'
+    # The client itself still decodes responses
+    assert es.transport.perform_request('GET', '/index/_doc/1/_source') == {'content': {'species': {}}}
+
+
+def test_get_dc_results_miss_is_not_decoded():
+    from ensembl.production.datacheck import utils
+    es = mock.Mock()
+    es.search.return_value = {'hits': {'hits': [{'_id': 'a/b', '_type': '_doc', 'sort': ['2023-01-01']}]}}
+    es.raw_transport.perform_request.return_value = b'{"content":{"species":{"ok":1}}}'
+    with mock.patch.object(utils, 'get_es_client', return_value=es), \
+            mock.patch.object(utils.json, 'loads', side_effect=AssertionError('decoded')), \
+            mock.patch.object(utils.json, 'dumps', side_effect=AssertionError('encoded')):
+        result = utils.get_datacheck_results('/miss/results.json', es_index='miss_is_not_decoded', raw=True)
+    assert result == {'status': True, 'message': '', 'result': b'{"species":{"ok":1}}'}
+    es.raw_transport.perform_request.assert_called_once_with('GET', '/miss_is_not_decoded/_doc/a%2Fb/_source',
+                                                             params={'_source_includes': 'content'})
+
+
+def test_batch_filter_path():
+    from ensembl.production.datacheck.utils import _batch_filter_path
+    assert _batch_filter_path.split(',') == ['responses.error', 'responses.status', 'responses.took',
+                                             'responses.hits.hits._source.content', 'responses.hits.hits.sort']
+
+
+def hit(content, report_time):
+    return {'took': 1, 'hits': {'hits': [{'_source': {'content': content}, 'sort': [report_time]}]}}
+
+
+def test_get_dc_results_batch_with_and_without_hits():
+    from ensembl.production.datacheck.utils import get_datacheck_results_batch
+    files = ['/batch/first.json', '/batch/none.json', '/batch/last.json']
+    es = mock.Mock()
+    # Responses without hits are kept in place by took
+    es.msearch.return_value = {'responses': [hit({'first': {}}, '2023-01-01'), {'took': 1},
+                                             hit({'last': {}}, '2023-01-02')]}
+    with mock.patch('ensembl.production.datacheck.utils.get_es_client', return_value=es):
+        results = get_datacheck_results_batch(files, es_index='batch_with_and_without_hits')
+    assert results[files[0]]['result'] == b'{"first": {}}'
+    assert 'No Hits Found' in results[files[1]]['message']
+    assert results[files[2]]['result'] == b'{"last": {}}'
+
+
+def test_get_dc_results_batch_with_missing_responses():
+    from ensembl.production.datacheck.utils import get_datacheck_results_batch
+    files = ['/batch/first.json', '/batch/none.json', '/batch/last.json']
+    es = mock.Mock()
+    es.msearch.return_value = {'responses': [hit({'first': {}}, '2023-01-01'), hit({'last': {}}, '2023-01-02')]}
+    with mock.patch('ensembl.production.datacheck.utils.get_es_client', return_value=es):
+        results = get_datacheck_results_batch(files, es_index='batch_with_missing_responses')
+    assert all(not result['status'] for result in results.values())
+    assert 'returned 2 responses for 3 files' in results[files[0]]['message']
@@ -0,0 +1,28 @@
+# .. See the NOTICE file distributed with this work for additional information
+#     regarding copyright ownership.
+#     Licensed under the Apache License, Version 2.0 (the "License");
+#     you may not use this file except in compliance with the License.
+#     You may obtain a copy of the License at
+#         http://www.apache.org/licenses/LICENSE-2.0
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+import io
+import os
+from zipfile import ZipFile
+
+from ensembl.production.datacheck.utils import stream_zip
+
+
+def test_stream_zip(tmp_path):
+    contents = {f'species_{i}.json': os.urandom(10000 * (i + 1)) for i in range(3)}
+    for name, content in contents.items():
+        (tmp_path / name).write_bytes(content)
+    chunks = list(stream_zip(sorted(tmp_path.iterdir()), chunk_size=4096))
+    # Written as the files are read, never as a whole
+    assert max(len(chunk) for chunk in chunks) < 8192
+    with ZipFile(io.BytesIO(b''.join(chunks))) as z:
+        assert z.testzip() is None
+        assert {name: z.read(name) for name in z.namelist()} == contents
@@ -0,0 +1,77 @@
+# .. See the NOTICE file distributed with this work for additional information
+#     regarding copyright ownership.
+#     Licensed under the Apache License, Version 2.0 (the "License");
+#     you may not use this file except in compliance with the License.
+#     You may obtain a copy of the License at
+#         http://www.apache.org/licenses/LICENSE-2.0
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+import json
+import threading
+from unittest import mock
+
+from ensembl.production.datacheck.app import main
+from ensembl.production.datacheck.events import JobWatcher, job_event_stream
+
+
+class FakeHive:
+    """Jobs completing after a number of polls, counting the polls"""
+
+    def __init__(self, polls_to_complete):
+        self.polls = {}
+        self.polls_to_complete = polls_to_complete
+
+    def fetch(self, job_id):
+        self.polls[job_id] = self.polls.get(job_id, 0) + 1
+        status = 'complete' if self.polls[job_id] >= self.polls_to_complete else 'running'
+        return {'id': job_id, 'status': status}
+
+
+def events(stream):
+    return [event for event in stream if event.startswith('event:')]
+
+
+def test_stream_ends_on_terminal_status():
+    hive = FakeHive(polls_to_complete=3)
+    watcher = JobWatcher(hive.fetch, interval=0.01)
+    stream = events(job_event_stream(watcher, [1], lambda job: job['status'] == 'complete', max_duration=5))
+    # Unchanged states are only sent once
+    assert len(stream) == 3
+    assert json.loads(stream[0].split('data: ')[1]) == {'id': 1, 'status': 'running'}
+    assert json.loads(stream[1].split('data: ')[1]) == {'id': 1, 'status': 'complete'}
+    assert stream[-1].startswith('event: end')
+
+
+def test_watchers_share_polls():
+    hive = FakeHive(polls_to_complete=20)
+    watcher = JobWatcher(hive.fetch, interval=0.05)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(events(
+        job_event_stream(watcher, [1, 2], lambda job: job['status'] == 'complete', max_duration=5))))
+        for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(result[-1].startswith('event: end') for result in results)
+    # Polls are shared by the 10 streams, rather than made by each of them
+    assert hive.polls[1] < 30
+
+
+def test_event_streams_per_worker_are_capped(appclient):
+    with mock.patch.object(main, 'event_streams', threading.BoundedSemaphore(2)):
+        streams = [appclient.get(f'/jobs/{job_id}/events') for job_id in (1, 2)]
+        assert [response.status_code for response in streams] == [200, 200]
+        response = appclient.get('/jobs/3/events')
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == str(int(main.DatacheckConfig.SSE_MAX_DURATION))
+        # A stream closed, even before being sent, leaves room for another
+        streams.pop().close()
+        response = appclient.get('/jobs/3/events')
+        assert response.status_code == 200
+        response.close()
+        for response in streams:
+            response.close()
@@ -0,0 +1,226 @@
+# .. See the NOTICE file distributed with this work for additional information
+#     regarding copyright ownership.
+#     Licensed under the Apache License, Version 2.0 (the "License");
+#     you may not use this file except in compliance with the License.
+#     You may obtain a copy of the License at
+#         http://www.apache.org/licenses/LICENSE-2.0
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+import json
+import time
+from unittest import mock
+
+import pytest
+from ensembl.production.core.models.hive import Analysis, AnalysisData, Base, Job, Result, Session
+from ensembl.production.core.perl_utils import dict_to_perl_string
+from sqlalchemy import event, select
+
+from ensembl.production.datacheck.config import DatacheckConfig as dcg
+from ensembl.production.datacheck.hive import PooledHiveInstance, create_jobs, decode_cursor, encode_cursor, \
+    get_hive_instance, get_job_result, get_jobs_page, get_jobs_since, job_results_cache, normalise_job_status, \
+    reset_hive_instance, statuses
+
+
+@pytest.fixture
+def hive():
+    job_results_cache.clear()
+    hive = PooledHiveInstance('sqlite://')
+    Base.metadata.create_all(hive.engine)
+    with Session() as session:
+        session.add(Analysis(analysis_id=1, logic_name='DataCheckSubmission'))
+        session.add(Analysis(analysis_id=2, logic_name='RunDataChecks'))
+        session.add(AnalysisData(analysis_data_id=1, data=dict_to_perl_string({'dbname': 'danio_rerio_core_110_11'})))
+        for job_id, dbname, status, failed in [(1, 'homo_sapiens_core_110_38', 'DONE', 0),
+                                               (2, 'mus_musculus_core_110_39', 'DONE', 3),
+                                               (3, 'homo_sapiens_variation_110_38', 'FAILED', None),
+                                               (4, 'homo_sapiens_funcgen_110_38', 'READY', None)]:
+            session.add(Job(job_id=job_id, analysis_id=1, status=status,
+                            input_id=dict_to_perl_string({'dbname': dbname, 'tag': 'release'})))
+            if failed is not None:
+                session.add(Result(job_id=job_id, output=json.dumps({'failed_total': failed, 'passed_total': 1})))
+        session.add(Job(job_id=5, analysis_id=1, status='RUN', input_id='_extended_data_id 1'))
+        session.add(Job(job_id=6, analysis_id=2, status='READY', input_id=dict_to_perl_string({'dbname': 'x'})))
+        session.commit()
+    return hive
+
+
+def test_jobs_page(hive):
+    page = get_jobs_page(hive, 'DataCheckSubmission', limit=2, offset=1)
+    assert page.total == 5
+    assert [job['id'] for job in page.rows] == [4, 3]
+    page = get_jobs_page(hive, 'DataCheckSubmission', sort='id', order='asc')
+    assert [job['id'] for job in page.rows] == [1, 2, 3, 4, 5]
+
+
+def test_jobs_page_search(hive):
+    page = get_jobs_page(hive, 'DataCheckSubmission', search='homo_sapiens')
+    assert [job['id'] for job in page.rows] == [4, 3, 1]
+    page = get_jobs_page(hive, 'DataCheckSubmission', search='danio')
+    assert page.total == 1
+    assert page.rows[0]['input']['dbname'] == 'danio_rerio_core_110_11'
+    # LIKE wildcards are matched literally
+    assert get_jobs_page(hive, 'DataCheckSubmission', search='%').total == 0
+    assert get_jobs_page(hive, 'DataCheckSubmission', search='ns_c_re').total == 0
+    assert get_jobs_page(hive, 'DataCheckSubmission', search='sapiens_core').total == 1
+
+
+def test_jobs_page_status(hive):
+    assert [job['id'] for job in get_jobs_page(hive, 'DataCheckSubmission', status='complete').rows] == [1]
+    assert [job['id'] for job in get_jobs_page(hive, 'DataCheckSubmission', status='failed').rows] == [3, 2]
+    assert [job['id'] for job in get_jobs_page(hive, 'DataCheckSubmission', status='incomplete').rows] == [5, 4]
+
+
+def test_jobs_since(hive):
+    cursor = get_jobs_page(hive, 'DataCheckSubmission', limit=1).cursor
+    assert decode_cursor(cursor) == (5, [4, 5])
+    delta = get_jobs_since(hive, 'DataCheckSubmission', cursor)
+    # Nothing new: only the incomplete jobs
+    assert [job['id'] for job in delta.rows] == [5, 4]
+    with Session() as session:
+        session.add(Job(job_id=7, analysis_id=1, status='READY', input_id=dict_to_perl_string({'dbname': 'y'})))
+        session.query(Job).filter(Job.job_id == 4).update({'status': 'FAILED'})
+        session.commit()
+    delta = get_jobs_since(hive, 'DataCheckSubmission', delta.cursor)
+    assert [job['id'] for job in delta.rows] == [7, 5, 4]
+    assert delta.rows[2]['status'] == 'failed'
+    assert decode_cursor(delta.cursor) == (7, [5, 7])
+    with pytest.raises(ValueError):
+        get_jobs_since(hive, 'DataCheckSubmission', 'not a cursor')
+
+
+def test_jobs_since_tracks_recent_pending_jobs(hive):
+    with Session() as session:
+        # Done without a result, incomplete for ever
+        session.query(Job).filter(Job.job_id == 4).update({'status': 'DONE'})
+        session.commit()
+    with mock.patch.object(dcg, 'JOBS_CURSOR_MAX_PENDING', 2):
+        cursor = get_jobs_page(hive, 'DataCheckSubmission', limit=1).cursor
+        assert decode_cursor(cursor) == (5, [4, 5])
+        with Session() as session:
+            for job_id in (7, 8):
+                session.add(Job(job_id=job_id, analysis_id=1, status='READY', input_id=dict_to_perl_string({})))
+            session.commit()
+        delta = get_jobs_since(hive, 'DataCheckSubmission', cursor)
+        # Still refreshed once, then left out of the cursor for the newer jobs
+        assert [job['id'] for job in delta.rows] == [8, 7, 5, 4]
+        assert decode_cursor(delta.cursor) == (8, [7, 8])
+        delta = get_jobs_since(hive, 'DataCheckSubmission', delta.cursor)
+        assert [job['id'] for job in delta.rows] == [8, 7]
+        # Cursors with more pending jobs are cut down to the most recent ones
+        delta = get_jobs_since(hive, 'DataCheckSubmission', encode_cursor(8, [1, 2, 3, 4, 5]))
+        assert [job['id'] for job in delta.rows] == [8, 7, 5, 4]
+
+
+def test_normalise_job_status():
+    assert normalise_job_status({'status': 'running'}, 'incomplete')['status'] == 'incomplete'
+    assert normalise_job_status({'status': 'complete', 'output': {'failed_total': 1, 'passed_total': 2}},
+                                'failed')['status'] == 'failed'
+
+
+def assert_listed_as_displayed(hive):
+    # Each job is filtered and sorted with the status it is displayed with
+    displayed = {job['id']: job['status'] for job in get_jobs_page(hive, 'DataCheckSubmission').rows}
+    for status in statuses:
+        filtered = [job['id'] for job in get_jobs_page(hive, 'DataCheckSubmission', status=status).rows]
+        assert filtered == sorted((job_id for job_id in displayed if displayed[job_id] == status), reverse=True)
+    for job_id, status in displayed.items():
+        job_results_cache.clear()
+        assert get_job_result(hive, job_id, progress=False)['status'] == status
+    rows = get_jobs_page(hive, 'DataCheckSubmission', sort='status', order='asc').rows
+    assert [job['status'] for job in rows] == sorted(displayed.values())
+    return displayed
+
+
+def test_job_status(hive):
+    with Session() as session:
+        # Done but with failed children, and without a result
+        session.add(Job(job_id=7, analysis_id=1, status='DONE', input_id=dict_to_perl_string({'dbname': 'a'})))
+        session.add(Job(job_id=8, analysis_id=2, status='DONE', prev_job_id=7, input_id='{}'))
+        session.add(Job(job_id=9, analysis_id=2, status='FAILED', prev_job_id=8, input_id='{}'))
+        # Done, with children still running
+        session.add(Job(job_id=10, analysis_id=1, status='DONE', input_id=dict_to_perl_string({'dbname': 'b'})))
+        session.add(Job(job_id=11, analysis_id=2, status='RUN', prev_job_id=10, input_id='{}'))
+        # With a result, but retried by the hive
+        session.add(Job(job_id=12, analysis_id=1, status='RUN', input_id=dict_to_perl_string({'dbname': 'c'})))
+        session.add(Result(job_id=12, output=json.dumps({'failed_total': 0, 'passed_total': 1})))
+        # Result encoded with other spacing
+        session.add(Job(job_id=13, analysis_id=1, status='DONE', input_id=dict_to_perl_string({'dbname': 'd'})))
+        session.add(Result(job_id=13, output=json.dumps({'passed_total': 10, 'failed_total': 0}, indent=2)))
+        session.commit()
+    assert assert_listed_as_displayed(hive) == {1: 'complete', 2: 'failed', 3: 'failed', 4: 'incomplete',
+                                                5: 'incomplete', 7: 'failed', 10: 'incomplete', 12: 'incomplete',
+                                                13: 'complete'}
+
+
+def test_job_results_cached_once_terminal(hive):
+    assert get_job_result(hive, 2, progress=False)['status'] == 'failed'
+    assert get_job_result(hive, 4, progress=False)['status'] == 'incomplete'
+    with Session() as session:
+        session.query(Job).filter(Job.job_id.in_([2, 4])).update({'status': 'FAILED'}, synchronize_session=False)
+        session.commit()
+    hits = job_results_cache.hits
+    # Terminal job served from the cache, in-flight job from the cache until its ttl expires
+    assert get_job_result(hive, 2, progress=False)['status'] == 'failed'
+    assert get_job_result(hive, 4, progress=False)['status'] == 'incomplete'
+    assert job_results_cache.hits == hits + 2
+    job_results_cache.pop((4, False))
+    assert get_job_result(hive, 4, progress=False)['status'] == 'failed'
+    # Jobs listed reuse the cached results
+    assert get_jobs_page(hive, 'DataCheckSubmission', status='failed').total == 3
+    with pytest.raises(ValueError):
+        get_job_result(hive, 42)
+
+
+def test_done_job_without_result_is_not_final(hive):
+    with Session() as session:
+        session.query(Job).filter(Job.job_id == 4).update({'status': 'DONE'}, synchronize_session=False)
+        session.commit()
+    with mock.patch.object(dcg, 'JOB_RESULTS_CACHE_TTL', 0.01):
+        job = get_job_result(hive, 4, progress=False)
+        assert job['status'] == 'incomplete'
+        assert [job['id'] for job in get_jobs_page(hive, 'DataCheckSubmission', status='incomplete').rows] == [5, 4]
+        with Session() as session:
+            session.add(Result(job_id=4, output=json.dumps({'failed_total': 0, 'passed_total': 2})))
+            session.commit()
+        time.sleep(0.02)
+        job = get_job_result(hive, 4, progress=False)
+    assert job['status'] == 'complete'
+    assert job['output']['passed_total'] == 2
+
+
+def test_hive_instance_per_process(caplog):
+    reset_hive_instance()
+    hive = get_hive_instance('sqlite://')
+    assert get_hive_instance('sqlite://') is hive
+    assert hive.read_engine is hive.engine
+    with caplog.at_level('DEBUG', logger='ensembl.production.datacheck.hive'):
+        with hive.read_session() as session:
+            session.execute(select(1))
+    assert 'hive query in' in caplog.text
+    reset_hive_instance()
+    assert get_hive_instance('sqlite://') is not hive
+    reset_hive_instance()
+
+
+def test_create_jobs(hive):
+    job_ids = create_jobs(hive, 'DataCheckSubmission', [{'dbname': ['a_core_110_1']}, {'dbname': ['b_core_110_1']}])
+    assert job_ids == [7, 8]
+    assert get_job_result(hive, 8, progress=False)['input']['dbname'] == ['b_core_110_1']
+    with pytest.raises(ValueError):
+        create_jobs(hive, 'Unknown', [{'dbname': ['c_core_110_1']}])
+
+
+def test_create_jobs_without_reloading_them(hive):
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(hive.engine, 'before_cursor_execute', listener)
+    try:
+        create_jobs(hive, 'DataCheckSubmission', [{'dbname': [f'{i}_core_110_1']} for i in range(5)])
+    finally:
+        event.remove(hive.engine, 'before_cursor_execute', listener)
+    # Only the analysis is read
+    assert len([statement for statement in statements if statement.lstrip().upper().startswith('SELECT')]) == 1
+
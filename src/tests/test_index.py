@@ -0,0 +1,71 @@
+# .. See the NOTICE file distributed with this work for additional information
+#     regarding copyright ownership.
+#     Licensed under the Apache License, Version 2.0 (the "License");
+#     you may not use this file except in compliance with the License.
+#     You may obtain a copy of the License at
+#         http://www.apache.org/licenses/LICENSE-2.0
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+import pytest
+
+from ensembl.production.datacheck.index import DatacheckIndex
+
+datachecks = {
+    "SpeciesCommonName": {
+        "name": "SpeciesCommonName",
+        "description": "Species common name is defined in the meta table",
+        "datacheck_type": "critical",
+        "groups": ["core", "meta"]
+    },
+    "CompareMetaKeys": {
+        "name": "CompareMetaKeys",
+        "description": "Compare meta key counts between two databases",
+        "datacheck_type": "advisory",
+        "groups": ["compare_core", "meta"]
+    },
+    "AlignFeatureExternalDB": {
+        "name": "AlignFeatureExternalDB",
+        "description": "Align features have an external DB",
+        "datacheck_type": "critical",
+        "groups": ["core"]
+    }
+}
+
+
+@pytest.fixture
+def index():
+    return DatacheckIndex(datachecks)
+
+
+def test_lists_are_sorted(index):
+    assert index.names_list == ["AlignFeatureExternalDB", "CompareMetaKeys", "SpeciesCommonName"]
+    assert index.groups_list == ["compare_core", "core", "meta"]
+    assert index.types_list == ["advisory", "critical"]
+
+
+def test_by_name(index):
+    assert index.by_name() == datachecks
+    assert index.by_name("CompareMetaKeys") == {"CompareMetaKeys": [datachecks["CompareMetaKeys"]]}
+    assert index.by_name("Unknown") == {}
+
+
+def test_by_group(index):
+    assert set(index.by_group()) == {"compare_core", "core", "meta"}
+    assert index.by_group("meta") == {"meta": [datachecks["SpeciesCommonName"], datachecks["CompareMetaKeys"]]}
+    assert index.by_group("Unknown") == {}
+
+
+def test_by_type(index):
+    assert [params["name"] for params in index.by_type()["critical"]] == ["SpeciesCommonName",
+                                                                          "AlignFeatureExternalDB"]
+    assert index.by_type("advisory") == {"advisory": [datachecks["CompareMetaKeys"]]}
+    assert index.by_type("Unknown") == {}
+
+
+def test_empty_index():
+    index = DatacheckIndex({})
+    assert not index
+    assert index.names_list == []
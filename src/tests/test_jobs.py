@@ -0,0 +1,131 @@
+# .. See the NOTICE file distributed with this work for additional information
+#     regarding copyright ownership.
+#     Licensed under the Apache License, Version 2.0 (the "License");
+#     you may not use this file except in compliance with the License.
+#     You may obtain a copy of the License at
+#         http://www.apache.org/licenses/LICENSE-2.0
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+import json
+from unittest import mock
+
+import pytest
+from ensembl.production.core.models.hive import Analysis, Base, Job, Result, Session
+from ensembl.production.core.perl_utils import dict_to_perl_string
+
+from ensembl.production.datacheck.app import main
+from ensembl.production.datacheck.config import DatacheckConfig as dcg
+from ensembl.production.datacheck.hive import PooledHiveInstance, decode_cursor, job_results_cache
+from ensembl.production.datacheck.index import DatacheckIndex
+
+server_url = 'mysql://ensro@test-server-1:3306/'
+
+datachecks = {
+    'SpeciesCommonName': {'name': 'SpeciesCommonName', 'groups': ['core', 'meta'], 'datacheck_type': 'critical',
+                          'description': 'Species common name is defined'},
+    'CompareMetaKeys': {'name': 'CompareMetaKeys', 'groups': ['compare_core'], 'datacheck_type': 'advisory',
+                        'description': 'Compare meta keys with the previous release'},
+    'MetaKeyFormat': {'name': 'MetaKeyFormat', 'groups': ['core', 'meta'], 'datacheck_type': 'critical',
+                      'description': 'Meta data values are formatted correctly'},
+}
+
+
+def payload(dbname, server=server_url):
+    return {'server_url': server, 'dbname': dbname, 'species': None, 'division': None,
+            'datacheck_names': ['SpeciesCommonName'], 'tag': 'test'}
+
+
+@pytest.fixture
+def hive(appclient):
+    job_results_cache.clear()
+    hive = PooledHiveInstance('sqlite://')
+    Base.metadata.create_all(hive.engine)
+    with Session() as session:
+        session.add(Analysis(analysis_id=1, logic_name=appclient.application.analysis))
+        for job_id, status, failed in [(1, 'DONE', 0), (2, 'DONE', 2), (3, 'READY', None), (4, 'RUN', None)]:
+            session.add(Job(job_id=job_id, analysis_id=1, status=status,
+                            input_id=dict_to_perl_string({'dbname': f'db_{job_id}', 'tag': 'release'})))
+            if failed is not None:
+                session.add(Result(job_id=job_id, output=json.dumps({'failed_total': failed, 'passed_total': 1})))
+        session.commit()
+    with mock.patch.object(main, 'get_hive', return_value=hive), \
+            mock.patch.object(main, 'set_db_type', return_value='core'):
+        yield hive
+
+
+def hive_job_ids():
+    with Session() as session:
+        return [job_id for job_id, in session.query(Job.job_id).order_by(Job.job_id)]
+
+
+def test_submit_batch(appclient, hive):
+    response = appclient.post('/jobs/batch', json={'jobs': [payload('a_core_110_1'), payload('b_core_110_1')]})
+    assert response.status_code == 201
+    assert response.json == {'jobs': [{'job_id': 5}, {'job_id': 6}]}
+    assert hive_job_ids() == [1, 2, 3, 4, 5, 6]
+
+
+def test_submit_batch_partly_invalid(appclient, hive):
+    jobs = [payload('a_core_110_1'), payload('b_core_110_1', server='http://test-server-1/'),
+            payload('c_core_110_1'), payload('d_core_110_1', server='mysql://ensro@unknown:3306/'), 'not a job']
+    response = appclient.post('/jobs/batch', json={'jobs': jobs})
+    assert response.status_code == 207
+    results = response.json['jobs']
+    # A result per payload, in their order
+    assert [result.get('job_id') for result in results] == [5, None, 6, None, None]
+    assert all('error' in results[i] for i in (1, 3, 4))
+    assert hive_job_ids() == [1, 2, 3, 4, 5, 6]
+
+
+@pytest.mark.parametrize('body', [None, [], {}, {'jobs': []}, {'jobs': {'dbname': 'a_core_110_1'}},
+                                  [payload('a_core_110_1')], {'jobs': [{'dbname': 'a_core_110_1'}]}])
+def test_submit_batch_invalid(appclient, hive, body):
+    response = appclient.post('/jobs/batch', data=json.dumps(body) if body is not None else '',
+                              content_type='application/json')
+    assert response.status_code == 400
+    assert hive_job_ids() == [1, 2, 3, 4]
+
+
+def test_submit_batch_too_large(appclient, hive):
+    with mock.patch.object(dcg, 'JOB_BATCH_MAX', 2):
+        response = appclient.post('/jobs/batch', json={'jobs': [payload(f'{i}_core_110_1') for i in range(3)]})
+    assert response.status_code == 400
+    assert hive_job_ids() == [1, 2, 3, 4]
+
+
+def test_jobs_page(appclient, hive):
+    response = appclient.get('/jobs?format=json&limit=2&offset=1&sort=id&order=asc')
+    assert response.status_code == 200
+    assert response.json['total'] == 4
+    assert [job['id'] for job in response.json['rows']] == [2, 3]
+    assert decode_cursor(response.json['cursor']) == (4, [3, 4])
+    response = appclient.get('/jobs?format=json&limit=10&status=failed')
+    assert [(job['id'], job['status']) for job in response.json['rows']] == [(2, 'failed')]
+    response = appclient.get('/jobs?format=json&limit=10&search=db_1')
+    assert [job['id'] for job in response.json['rows']] == [1]
+    assert appclient.get('/jobs?format=json&limit=10&status=unknown').status_code == 400
+
+
+def test_jobs_since(appclient, hive):
+    cursor = appclient.get('/jobs?format=json&limit=1').json['cursor']
+    response = appclient.get('/jobs', query_string={'format': 'json', 'since': cursor})
+    assert response.status_code == 200
+    assert [job['id'] for job in response.json['rows']] == [4, 3]
+    assert appclient.get('/jobs?format=json&since=invalid').status_code == 400
+
+
+def test_search(appclient):
+    with mock.patch.object(main, 'get_index', return_value=DatacheckIndex(datachecks)):
+        response = appclient.get('/search/meta')
+        assert response.status_code == 200
+        assert {datacheck['name'] for datacheck in response.json['meta']} == set(datachecks)
+        response = appclient.get('/search/meta?limit=1')
+        assert len(response.json['meta']) == 1
+        assert appclient.get('/search/unmatched').json == {}
+        response = appclient.get('/search/^Meta.*Format$?mode=regex')
+        assert [datacheck['name'] for datacheck in response.json['^Meta.*Format$']] == ['MetaKeyFormat']
+        assert appclient.get('/search/meta?limit=-1').status_code == 400
+        assert appclient.get('/search/(meta?mode=regex').status_code == 400
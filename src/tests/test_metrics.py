@@ -0,0 +1,82 @@
+# .. See the NOTICE file distributed with this work for additional information
+#     regarding copyright ownership.
+#     Licensed under the Apache License, Version 2.0 (the "License");
+#     you may not use this file except in compliance with the License.
+#     You may obtain a copy of the License at
+#         http://www.apache.org/licenses/LICENSE-2.0
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+from unittest import mock
+
+import pytest
+from prometheus_client import REGISTRY
+
+from ensembl.production.datacheck.app import main
+from ensembl.production.datacheck.cache import LRUCache
+from ensembl.production.datacheck.metrics import backend_timer
+from ensembl.production.datacheck.utils import es_operation
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_backend_timer():
+    labels = {'backend': 'mysql', 'operation': 'test'}
+    with backend_timer('mysql', 'test'):
+        pass
+    with pytest.raises(RuntimeError):
+        with backend_timer('mysql', 'test'):
+            raise RuntimeError('unreachable')
+    assert sample('datacheck_backend_duration_seconds_count', **labels) == 2
+    assert sample('datacheck_backend_errors_total', **labels) == 1
+
+
+def test_cache_lookups():
+    cache = LRUCache('test_metrics', 1)
+    cache.set('a', 1)
+    cache.get('a')
+    cache.get('b')
+    cache.set('b', 2)
+    assert sample('datacheck_cache_lookups_total', cache='test_metrics', result='hit') == 1
+    assert sample('datacheck_cache_lookups_total', cache='test_metrics', result='miss') == 1
+    assert sample('datacheck_cache_evictions_total', cache='test_metrics') == 1
+
+
+def test_es_operation():
+    assert es_operation('POST', '/datacheck_results/_search') == '_search'
+    assert es_operation('POST', '/_msearch') == '_msearch'
+    assert es_operation('HEAD', '/') == 'head'
+
+
+def test_metrics_endpoint(appclient):
+    appclient.get('/ping')
+    response = appclient.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain')
+    assert b'datacheck_request_duration_seconds_count{endpoint="ping",method="GET",status="200"}' in response.data
+    assert b'datacheck_requests_in_progress{endpoint="metrics"} 1.0' in response.data
+
+
+def test_server_names_backend(appclient):
+    app = appclient.application
+    flag = app.config['GET_SERVER_NAMES']
+    file_loads = sample('datacheck_backend_duration_seconds_count', backend='file', operation='server_names')
+    dbcopy_loads = sample('datacheck_backend_duration_seconds_count', backend='dbcopy', operation='server_names')
+    try:
+        app.config['GET_SERVER_NAMES'] = False
+        assert main.load_server_names()
+        app.config['GET_SERVER_NAMES'] = True
+        with mock.patch.object(main, 'get_server_names', return_value={}) as get_server_names:
+            main.load_server_names()
+        assert get_server_names.call_args[0][1] is True
+    finally:
+        app.config['GET_SERVER_NAMES'] = flag
+    # Read from the SERVER_NAMES file, then fetched from dbcopy
+    assert sample('datacheck_backend_duration_seconds_count', backend='file', operation='server_names') \
+           == file_loads + 1
+    assert sample('datacheck_backend_duration_seconds_count', backend='dbcopy', operation='server_names') \
+           == dbcopy_loads + 1
@@ -0,0 +1,62 @@
+# .. See the NOTICE file distributed with this work for additional information
+#     regarding copyright ownership.
+#     Licensed under the Apache License, Version 2.0 (the "License");
+#     you may not use this file except in compliance with the License.
+#     You may obtain a copy of the License at
+#         http://www.apache.org/licenses/LICENSE-2.0
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+import os
+import pstats
+import time
+
+import pytest
+
+from ensembl.production.datacheck.profiling import RequestProfile
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_pstats_profile(tmp_path):
+    with RequestProfile(str(tmp_path), '/jobs/details') as profile:
+        busy(0.01)
+    path, = tmp_path.iterdir()
+    assert '-jobs_details-' in path.name and path.name.endswith('.pstats')
+    stats = pstats.Stats(str(path))
+    assert any(function == 'busy' for _, _, function in stats.stats)
+    assert profile.route == '/jobs/details'
+
+
+def test_collapsed_profile(tmp_path):
+    with RequestProfile(str(tmp_path), '/jobs/<int:job_id>', 'collapsed'):
+        busy(0.1)
+    path, = tmp_path.iterdir()
+    assert '-jobs_int_job_id-' in path.name and path.name.endswith('.collapsed')
+    lines = path.read_text().splitlines()
+    assert lines
+    stack, count = lines[0].rsplit(' ', 1)
+    assert 'busy (test_profiling.py' in stack.split(';')[-1]
+    assert int(count) > 0
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        RequestProfile(str(tmp_path), '/jobs', 'svg')
+
+
+def test_profiled_request(appclient, tmp_path):
+    app = appclient.application
+    app.config.update(PROFILING_ENABLED=True, PROFILING_DIR=str(tmp_path), PROFILING_TOKEN='secret')
+    try:
+        assert 'X-Profile' not in appclient.get('/ping?profile=wrong').headers
+        response = appclient.get('/ping', headers={'X-Profile': 'secret'})
+        assert response.headers['X-Profile'] in os.listdir(tmp_path)
+    finally:
+        app.config.update(PROFILING_ENABLED=False, PROFILING_TOKEN='')
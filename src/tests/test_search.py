@@ -0,0 +1,85 @@
+# .. See the NOTICE file distributed with this work for additional information
+#     regarding copyright ownership.
+#     Licensed under the Apache License, Version 2.0 (the "License");
+#     you may not use this file except in compliance with the License.
+#     You may obtain a copy of the License at
+#         http://www.apache.org/licenses/LICENSE-2.0
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+import re
+
+import pytest
+
+from ensembl.production.datacheck.exceptions import SearchTimeoutException
+from ensembl.production.datacheck.search import SearchIndex, regex_search, tokenize
+
+datachecks = {
+    "SpeciesCommonName": {
+        "name": "SpeciesCommonName",
+        "description": "Species common name is defined in the meta table",
+        "groups": ["core", "meta"]
+    },
+    "CompareMetaKeys": {
+        "name": "CompareMetaKeys",
+        "description": "Compare meta key counts between two databases",
+        "groups": ["compare_core"]
+    },
+    "AlignFeatureExternalDB": {
+        "name": "AlignFeatureExternalDB",
+        "description": "Align features have an external DB",
+        "groups": ["core"]
+    },
+    "Slow": {
+        "name": "Slow",
+        "description": "a" * 30 + "!",
+        "groups": []
+    }
+}
+
+
+def names(results):
+    return [params["name"] for params in results]
+
+
+def test_tokenize():
+    assert tokenize("AlignFeatureExternalDB") == ["align", "feature", "external", "db"]
+    assert tokenize("compare_core") == ["compare", "core"]
+
+
+def test_search_ranks_names_first():
+    index = SearchIndex(datachecks)
+    assert names(index.search("meta")) == ["CompareMetaKeys", "SpeciesCommonName"]
+    assert names(index.search("external")) == ["AlignFeatureExternalDB"]
+
+
+def test_search_prefix_and_all_terms():
+    index = SearchIndex(datachecks)
+    assert names(index.search("speciescomm")) == ["SpeciesCommonName"]
+    assert names(index.search("align feat")) == ["AlignFeatureExternalDB"]
+    assert index.search("align meta") == []
+
+
+def test_search_exact_name_and_limit():
+    index = SearchIndex(datachecks)
+    assert names(index.search("CompareMetaKeys"))[0] == "CompareMetaKeys"
+    assert len(index.search("core", limit=1)) == 1
+    assert index.search("!!") == []
+
+
+def test_regex_search():
+    assert names(regex_search(datachecks, "^compare")) == ["CompareMetaKeys"]
+    with pytest.raises(re.error):
+        regex_search(datachecks, "(")
+
+
+def test_regex_search_timeout():
+    with pytest.raises(SearchTimeoutException):
+        regex_search(datachecks, "(a|aa)+$", timeout=0.2)
+
+
+def test_regex_search_limit():
+    assert len(regex_search(datachecks, "e", limit=2)) == 2
+    assert regex_search(datachecks, "e", limit=0) == []
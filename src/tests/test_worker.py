@@ -0,0 +1,88 @@
+# .. See the NOTICE file distributed with this work for additional information
+#     regarding copyright ownership.
+#     Licensed under the Apache License, Version 2.0 (the "License");
+#     you may not use this file except in compliance with the License.
+#     You may obtain a copy of the License at
+#         http://www.apache.org/licenses/LICENSE-2.0
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+import os
+import threading
+from unittest import mock
+
+import pytest
+from ensembl.production.core.models.hive import Analysis, Base, Job, Session
+from ensembl.production.core.perl_utils import dict_to_perl_string
+
+from ensembl.production.datacheck.catalog import Catalog
+from ensembl.production.datacheck.hive import PooledHiveInstance, job_results_cache
+
+
+@pytest.fixture
+def hive():
+    job_results_cache.clear()
+    hive = PooledHiveInstance('sqlite://')
+    Base.metadata.create_all(hive.engine)
+    with Session() as session:
+        session.add(Analysis(analysis_id=1, logic_name='DataCheckSubmission'))
+        for job_id in range(1, 4):
+            session.add(Job(job_id=job_id, analysis_id=1, status='READY',
+                            input_id=dict_to_perl_string({'dbname': f'db_{job_id}_core_110_1'})))
+        session.commit()
+    return hive
+
+
+def test_init_worker():
+    from ensembl.production.datacheck.app import main
+    with mock.patch.object(main, 'warm_up') as warm_up, \
+            mock.patch.object(main, 'reset_es_clients') as reset_es_clients, \
+            mock.patch.object(main, 'reset_hive_instance') as reset_hive_instance, \
+            mock.patch.object(main.app.catalog, 'after_fork') as after_fork:
+        assert not main.init_worker().is_alive()
+    reset_es_clients.assert_called_once_with()
+    reset_hive_instance.assert_called_once_with()
+    after_fork.assert_called_once_with()
+    warm_up.assert_called_once_with()
+
+
+def test_warm_up(hive):
+    from ensembl.production.datacheck.app import main
+    with mock.patch.object(main, 'get_hive', return_value=hive), \
+            mock.patch.object(main.app, 'analysis', 'DataCheckSubmission'), \
+            mock.patch.object(main, 'get_es_client') as get_es_client:
+        main.warm_up()
+    get_es_client.return_value.ping.assert_called_once_with()
+    # First page of the job list
+    assert len(job_results_cache) == 3
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="Requires fork")
+def test_catalog_reload_after_fork_during_reload():
+    started, release = threading.Event(), threading.Event()
+    loads = []
+
+    def servers_loader():
+        loads.append(os.getpid())
+        if len(loads) == 1:
+            started.set()
+            release.wait(5)
+        return {}
+
+    catalog = Catalog({}, {}, servers_loader=servers_loader)
+    reloader = catalog.reload_in_background()
+    started.wait(5)
+    pid = os.fork()
+    if pid == 0:
+        # The parent's reload lock was held when forked: the child must still be able to reload
+        catalog.after_fork()
+        catalog._reloader.join(5)
+        reloaded = threading.Thread(target=catalog.reload, daemon=True)
+        reloaded.start()
+        reloaded.join(5)
+        os._exit(0 if not reloaded.is_alive() and len(loads) == 3 else 1)
+    release.set()
+    reloader.join()
+    assert os.waitpid(pid, 0)[1] == 0